@@ -0,0 +1,211 @@
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from bot.util import features
+from bot.util.data import get_games
+from bot.util.model import FusedModel
+from bot.util.state import FeatureState
+from bot.v6final.bot import ManulPlayer6Final
+
+
+STAGES = ['update', 'sim3', 'vector', 'inference', 'total']
+STREETS = ['preflop', 'flop', 'turn', 'river']
+PERCENTILES = [50, 95, 99]
+
+
+class Timers(object):
+    def __init__(self):
+        self.totals = dict((stage, 0.0) for stage in STAGES)
+
+    def wrap(self, owner, name, stage):
+        func = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.totals[stage] += time.perf_counter() - start
+
+        setattr(owner, name, timed)
+
+    def snapshot(self):
+        return dict(self.totals)
+
+
+def call(timers, pending, func, *args):
+    before = timers.snapshot()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    sim3 = timers.totals['sim3'] - before['sim3']
+    vector = timers.totals['vector'] - before['vector']
+    inference = timers.totals['inference'] - before['inference']
+    pending['sim3'] += sim3
+    pending['vector'] += vector
+    pending['inference'] += inference
+    pending['update'] += elapsed - sim3 - vector - inference
+
+    return result
+
+
+def replay_game(game, timers, samples):
+    bots = {}
+    pending = {}
+
+    for seat in game['seats']:
+        bot = ManulPlayer6Final()
+        bot.set_uuid(seat['uuid'])
+        bots[seat['uuid']] = bot
+        pending[seat['uuid']] = dict((stage, 0.0) for stage in STAGES)
+        call(timers, pending[seat['uuid']], bot.receive_game_start_message, game)
+
+    for r in game['rounds']:
+        round_state = r['round_state']
+        round_state['pot']['main']['amount'] = 0
+        seats = {}
+
+        for seat in round_state['seats']:
+            seats[seat['uuid']] = seat
+            seat['stack'] = seat['start_stack']
+            seat['state'] = seat['start_state']
+
+        for a in round_state['action_histories']['preflop']:
+            if a['action'] in ['BIGBLIND', 'SMALLBLIND']:
+                seats[a['uuid']]['stack'] += a['amount']
+
+        for uuid, bot in bots.items():
+            pending[uuid] = dict((stage, 0.0) for stage in STAGES)
+            call(timers, pending[uuid], bot.receive_round_start_message,
+                 round_state['round_count'], seats[uuid]['hole_card'], round_state['seats'])
+
+        for street in STREETS:
+            if street not in round_state['action_histories']:
+                continue
+
+            for uuid, bot in bots.items():
+                if street != 'preflop':
+                    pending[uuid] = dict((stage, 0.0) for stage in STAGES)
+                call(timers, pending[uuid], bot.receive_street_start_message, street, round_state)
+
+            for a in round_state['action_histories'][street]:
+                uuid = a['uuid']
+                money = a['paid'] if 'paid' in a else 0
+                if money == 0:
+                    money = a['add_amount'] if 'add_amount' in a else 0
+
+                if a['action'] in ['BIGBLIND', 'SMALLBLIND']:
+                    money = a['amount']
+                elif not a['bot']['failed']:
+                    call(timers, pending[uuid], bots[uuid].declare_action,
+                         a['bot']['valid_actions'], seats[uuid]['hole_card'], round_state)
+
+                    sample = pending[uuid]
+                    sample['total'] = sum(sample[stage] for stage in STAGES if stage != 'total')
+                    samples[street].append(sample)
+                    pending[uuid] = dict((stage, 0.0) for stage in STAGES)
+
+                round_state['pot']['main']['amount'] += money
+                seats[uuid]['stack'] -= money
+
+                if a['action'] == 'FOLD':
+                    seats[uuid]['state'] = 'folded'
+
+                if a['action'] not in ['BIGBLIND', 'SMALLBLIND'] and not a['bot']['failed']:
+                    action = {
+                        'player_uuid': uuid,
+                        'action': a['action'].lower(),
+                        'amount': 0 if a['action'] == 'FOLD' else a['amount']
+                    }
+                    for bot_uuid, bot in bots.items():
+                        call(timers, pending[bot_uuid], bot.receive_game_update_message, action, round_state)
+
+        for uuid, bot in bots.items():
+            call(timers, pending[uuid], bot.receive_round_result_message, r['winners'], r['hand_info'], round_state)
+
+
+def summarize(samples):
+    result = {}
+
+    for street in STREETS:
+        if len(samples[street]) == 0:
+            continue
+
+        result[street] = {'decisions': len(samples[street])}
+        for stage in STAGES:
+            values = np.array([s[stage] for s in samples[street]]) * 1000
+            result[street][stage] = dict(('p' + str(p), round(float(np.percentile(values, p)), 4)) for p in PERCENTILES)
+
+    return result
+
+
+def compare(result, baseline, tolerance, min_diff):
+    regressions = []
+
+    for street in result:
+        for stage in STAGES:
+            if street not in baseline or stage not in baseline[street]:
+                continue
+
+            for p, value in result[street][stage].items():
+                base = baseline[street][stage][p]
+                if value > base * (1 + tolerance) and value - base > min_diff:
+                    regressions.append('{} {} {}: {:.3f} ms -> {:.3f} ms'.format(street, stage, p, base, value))
+
+    return regressions
+
+
+def print_report(result):
+    print('{:8} {:10} {:>9} {:>9} {:>9}'.format('street', 'stage', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for street in result:
+        for stage in STAGES:
+            r = result[street][stage]
+            print('{:8} {:10} {:9.3f} {:9.3f} {:9.3f}'.format(street, stage, r['p50'], r['p95'], r['p99']))
+        print('{:8} {:10} {:9d}'.format(street, 'decisions', result[street]['decisions']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('tournament_dir', nargs='?', default='../poker-vis/games/final/')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--min-diff', type=float, default=0.05)
+    args = parser.parse_args()
+
+    timers = Timers()
+    timers.wrap(features, 'get_sim3_proba', 'sim3')
+    timers.wrap(FeatureState, 'get_vector', 'vector')
+    timers.wrap(FusedModel, 'predict', 'inference')
+
+    samples = dict((street, []) for street in STREETS)
+    start = time.time()
+    num_games = 0
+
+    for game in get_games(args.tournament_dir):
+        if num_games >= args.games:
+            break
+        replay_game(game, timers, samples)
+        num_games += 1
+
+    result = summarize(samples)
+    print_report(result)
+    print('Games: {}, elapsed: {:.1f} sec'.format(num_games, time.time() - start))
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump({'games': num_games, 'streets': result}, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f)['streets'], args.tolerance, args.min_diff)
+
+        for r in regressions:
+            print('Regression: ' + r)
+
+        if len(regressions) > 0:
+            sys.exit(1)
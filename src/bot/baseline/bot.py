@@ -0,0 +1,54 @@
+import random
+from pypokerengine.players import BasePokerPlayer
+from bot.util.features import get_sim3_proba
+
+
+class CallPlayer(BasePokerPlayer):
+    def declare_action(self, valid_actions, hole_card, round_state, bot_state=None):
+        return valid_actions[1]['action'], valid_actions[1]['amount']
+
+    def receive_game_start_message(self, game_info):
+        pass
+
+    def receive_round_start_message(self, round_count, hole_card, seats):
+        pass
+
+    def receive_street_start_message(self, street, round_state):
+        pass
+
+    def receive_game_update_message(self, action, round_state):
+        pass
+
+    def receive_round_result_message(self, winners, hand_info, round_state):
+        pass
+
+
+class RandomPlayer(CallPlayer):
+    def declare_action(self, valid_actions, hole_card, round_state, bot_state=None):
+        action = random.choice(valid_actions)
+        if action['action'] == 'raise':
+            if action['amount']['min'] == -1:
+                action = valid_actions[1]
+            else:
+                return action['action'], random.randint(action['amount']['min'], action['amount']['max'])
+
+        return action['action'], action['amount']
+
+
+class EquityPlayer(CallPlayer):
+    def declare_action(self, valid_actions, hole_card, round_state, bot_state=None):
+        community_card = round_state['community_card']
+        if len(community_card) == 0:
+            return valid_actions[1]['action'], valid_actions[1]['amount']
+
+        proba = get_sim3_proba(hole_card, community_card)
+        pot = round_state['pot']['main']['amount']
+        call_amount = valid_actions[1]['amount']
+
+        if proba > 0.7 and valid_actions[2]['amount']['min'] != -1:
+            return valid_actions[2]['action'], valid_actions[2]['amount']['min']
+
+        if call_amount == 0 or proba >= call_amount / (pot + call_amount):
+            return valid_actions[1]['action'], valid_actions[1]['amount']
+
+        return valid_actions[0]['action'], valid_actions[0]['amount']
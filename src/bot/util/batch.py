@@ -0,0 +1,184 @@
+from .evaluator import encode_cards
+from .features import preflop_hand_class, preflop_odds, win_eval
+from .profiles import PROFILE_COLUMNS
+from .state import ACTIONS, CARD_COLUMNS, EQUITY_COLUMNS, GAME_COLUMNS, MAX_PLAYERS, PLAYER_COLUMNS, STRENGTH, STREETS
+from .state import get_columns, get_player_columns
+import operator
+import numpy as np
+
+
+STRENGTH_INDEX = dict((s, i) for i, s in enumerate(STRENGTH))
+STRENGTH_COLUMNS = ['card_hand_strength', 'card_hand_community_strength']
+
+GAME_KEYS = [
+    'round_count', 'small_blind_amount', 'initial_stack', 'total_stack', 'player_num', 'preflop_odds',
+    'pot', 'call_amount', 'raise_amount_min', 'raise_amount_max'
+] + [c for c in CARD_COLUMNS if c not in STRENGTH_COLUMNS] + [s + '_card_sim3_proba' for s in STREETS[1:]]
+GAME_FIELDS = STRENGTH_COLUMNS + ['street', 'hole_1', 'hole_2']
+
+PLAYER_KEYS = [c for c in PLAYER_COLUMNS[:-4] if c != 'hand_strength'] + \
+    ['me', 'num', 'start_stack', 'stack'] + [s + '_actions' for s in STREETS]
+PLAYER_FIELDS = PLAYER_KEYS + ['hand_strength', 'in_round']
+
+MONEY_COLUMNS = ['pot', 'call_amount', 'raise_amount_min', 'raise_amount_max']
+PRIVATE_MONEY_COLUMNS = [
+    'private_bot_action_amount', 'private_game_end_stack', 'private_round_end_stack_diff', 'private_round_end_stack'
+]
+
+ROUND_RATIO_COLUMNS = ['win_rounds', 'lose_rounds'] + [a + '_rounds' for a in ACTIONS] + \
+    [s + '_rounds' for s in STREETS[1:]]
+STREET_RATIO_COLUMNS = [(a + '_' + s + 's', s + '_actions') for a in ACTIONS for s in STREETS]
+FLOAT_COLUMNS = set(ROUND_RATIO_COLUMNS + [c for c, _ in STREET_RATIO_COLUMNS] + PROFILE_COLUMNS[1:] + [
+    'win_rounds_nohand', 'stack_rel_top_player', 'stack_rel_game_start', 'stack_rel_total',
+    'card_sim3_proba', 'preflop_odds'
+] + [s + '_card_sim3_proba' for s in STREETS[1:]] + EQUITY_COLUMNS)
+
+get_player = operator.itemgetter(*PLAYER_KEYS)
+
+
+def round1(values):
+    scaled = values * 10
+    result = np.rint(scaled) / 10
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-7
+    if ties.any():
+        result[ties] = [round(v, 1) for v in values[ties].tolist()]
+
+    return result
+
+
+def rint(values):
+    return np.rint(values).astype(np.int64)
+
+
+class FeatureBatch(object):
+    def __init__(self, profiles=None, equity=False):
+        self.profiles = profiles
+        self.profile_columns = [] if profiles is None else PROFILE_COLUMNS
+        self.equity_columns = EQUITY_COLUMNS if equity else []
+        self.player_columns = get_player_columns(self.profile_columns)
+        self.columns = get_columns(self.profile_columns, self.equity_columns)
+        self.game_keys = GAME_KEYS + self.equity_columns
+        self.get_game = operator.itemgetter(*self.game_keys)
+        self.private_keys = None
+        self.clear()
+
+    def __len__(self):
+        return len(self.game)
+
+    def clear(self):
+        self.game = []
+        self.players = []
+        self.rows = []
+        self.privates = []
+
+    def append(self, features):
+        if self.private_keys is None:
+            self.private_keys = [k for k in features if k.startswith('private_')]
+
+        row = len(self.game)
+        hole_1, hole_2 = encode_cards(features['hole_card'])
+        self.game.append(self.get_game(features) + (
+            STRENGTH_INDEX[features['card_hand_strength']],
+            STRENGTH_INDEX[features['card_hand_community_strength']],
+            STREETS.index(features['street']), hole_1, hole_2
+        ))
+
+        for uuid, player in features['players'].items():
+            p = get_player(player) + (STRENGTH_INDEX[player['hand_strength']], player['state'] == 'participating')
+            if self.profiles is not None:
+                p += tuple(self.profiles.get_features(uuid))
+            self.players.append(p)
+            self.rows.append(row)
+
+        self.privates.append(tuple(features[k] for k in self.private_keys))
+
+    def get_features(self):
+        import pandas as pd
+
+        n = len(self.game)
+        if n == 0:
+            return pd.DataFrame(columns=self.columns), pd.DataFrame()
+
+        fields = self.game_keys + GAME_FIELDS
+        g = dict(zip(fields, np.array(self.game, dtype=np.float64).reshape(n, len(fields)).T))
+        players = np.array(self.players, dtype=np.float64).reshape(len(self.players), -1)
+        p = dict(zip(PLAYER_FIELDS + self.profile_columns, players.T))
+        rows = np.array(self.rows, dtype=np.int64)
+
+        sb = g['small_blind_amount']
+        in_round = p['in_round'] > 0
+        players_in_game = np.bincount(rows, weights=p['start_stack'] > 0, minlength=n)
+        players_in_round = np.bincount(rows, weights=in_round, minlength=n)
+        max_stack = np.zeros(n)
+        np.maximum.at(max_stack, rows, p['stack'])
+
+        X = {}
+        for c in GAME_COLUMNS[:-2] + self.equity_columns:
+            X[c] = g[c]
+        for c in MONEY_COLUMNS:
+            X[c] = rint(g[c] / sb)
+
+        num_players = np.clip(players_in_game - 1, 0, 2).astype(np.int64)
+        hole_class = preflop_hand_class[g['hole_1'].astype(np.int64), g['hole_2'].astype(np.int64)]
+        X['preflop_odds'] = np.where(g['preflop_odds'] == 0,
+                                     round1(preflop_odds[hole_class, num_players]), g['preflop_odds'])
+        X['players_in_game'] = players_in_game
+        X['players_in_round'] = players_in_round
+
+        psb = sb[rows]
+        round_count = g['round_count'][rows]
+        v = dict(p)
+        for c in ROUND_RATIO_COLUMNS:
+            v[c] = round1(p[c] / round_count)
+        for c, actions in STREET_RATIO_COLUMNS:
+            v[c] = round1(p[c] / (p[actions] + 1))
+        v['win_rounds_nohand'] = round1(p['win_rounds_nohand'] / (p['win_rounds'] + 1))
+        v['stack'] = p['stack'] / psb
+        v['hand_paid'] = p['hand_paid'] / psb
+        v['paid'] = (p['start_stack'] - p['stack']) / psb
+        v['stack_rel_top_player'] = round1(p['stack'] / max_stack[rows])
+        v['stack_rel_game_start'] = round1(p['stack'] / g['initial_stack'][rows])
+        v['stack_rel_total'] = round1(p['stack'] / g['total_stack'][rows])
+        for c in ['stack', 'hand_paid', 'paid']:
+            v[c] = np.rint(v[c])
+
+        to_left = p['num'] < g['player_num'][rows]
+        order = np.lexsort((-p['num'], -to_left.astype(np.int64), -p['in_round'], -p['me'], rows))
+        starts = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))[:-1]])
+        rank = np.arange(len(order)) - starts[rows[order]]
+
+        for i in range(MAX_PLAYERS):
+            seat = order[rank == i]
+            seat = seat[in_round[seat]]
+            for c in self.player_columns:
+                if c in FLOAT_COLUMNS:
+                    values = np.full(n, -1.0)
+                else:
+                    values = np.full(n, -1, dtype=np.int64)
+                values[rows[seat]] = v[c][seat]
+                X['player_' + str(i) + '_' + c] = values
+
+        for c in GAME_COLUMNS:
+            if c not in FLOAT_COLUMNS:
+                X[c] = X[c].astype(np.int64)
+
+        return pd.DataFrame(X, columns=self.columns), pd.DataFrame(self.get_privates(sb), index=range(n))
+
+    def get_privates(self, sb):
+        if not self.private_keys:
+            return {}
+
+        y = dict((k, list(v)) for k, v in zip(self.private_keys, zip(*self.privates)))
+        if 'private_bot_action_amount' in y:
+            for c in PRIVATE_MONEY_COLUMNS:
+                y[c] = rint(np.array(y[c], dtype=np.float64) / sb)
+
+            best_hand = []
+            for hole, community, opponents in zip(y['private_hole_card'], y['private_community_card'],
+                                                  y['private_opponent_hole_card']):
+                community = encode_cards(community)
+                op_hand = win_eval(opponents, community) if len(opponents) > 0 else 0
+                best_hand.append(1 if win_eval([hole], community) >= op_hand else -1)
+            y['private_best_hand'] = best_hand
+
+        return y
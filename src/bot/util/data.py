@@ -1,9 +1,113 @@
+from . import features
+from .features import GamePlayer
+from .dataset import Dataset, clear_Xy, load_Xy
+from .profiles import OpponentProfiles
+import gc
 import json
 import glob
+import multiprocessing
+import os
+import pickle
+import struct
+import zlib
 import pandas as pd
 
 
-def get_games(tournament_dir, topN=None, player_names=None):
+GAME_STORE = 'games.store'
+
+
+class GameStore(object):
+    MAGIC = b'HOLDEMGS'
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            header = f.read(16)
+            if header[:8] != GameStore.MAGIC:
+                raise ValueError('Bad game store "{}"'.format(path))
+
+            f.seek(struct.unpack('<Q', header[8:])[0])
+            self.index = json.loads(zlib.decompress(f.read()).decode())
+
+        self.ids = [entry['id'] for entry in self.index]
+        self._entries = {entry['id']: entry for entry in self.index}
+
+    def find(self, names=None, min_rounds=None):
+        ids = []
+        for entry in self.index:
+            if names is not None and not any(name in names for name in entry['names']):
+                continue
+            if min_rounds is not None and entry['rounds'] < min_rounds:
+                continue
+            ids.append(entry['id'])
+
+        return ids
+
+    def entry(self, game_id):
+        return self._entries[game_id]
+
+    def load(self, game_id):
+        entry = self._entries[game_id]
+        with open(self.path, 'rb') as f:
+            f.seek(entry['offset'])
+            data = zlib.decompress(f.read(entry['size']))
+
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.loads(data)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    @staticmethod
+    def ingest(filenames, path):
+        index = []
+
+        with open(path, 'wb') as f:
+            f.write(GameStore.MAGIC + struct.pack('<Q', 0))
+
+            for filename in filenames:
+                with open(filename) as game_file:
+                    game = json.load(game_file)
+                data = zlib.compress(pickle.dumps(game, 4), 9)
+
+                index.append({
+                    'id': os.path.splitext(os.path.basename(filename))[0],
+                    'offset': f.tell(),
+                    'size': len(data),
+                    'names': [seat['name'] for seat in game['seats']],
+                    'rounds': len(game['rounds'])
+                })
+                f.write(data)
+
+            index_offset = f.tell()
+            f.write(zlib.compress(json.dumps(index).encode(), 9))
+            f.seek(len(GameStore.MAGIC))
+            f.write(struct.pack('<Q', index_offset))
+
+        return len(index)
+
+
+def ingest_games(tournament_dir):
+    return GameStore.ingest(sorted(glob.glob(tournament_dir + '*.json')), tournament_dir + GAME_STORE)
+
+
+def list_games(tournament_dir):
+    if os.path.isfile(tournament_dir + GAME_STORE):
+        return GameStore(tournament_dir + GAME_STORE).ids
+
+    return sorted(glob.glob(tournament_dir + '*.json'))
+
+
+def _load_json_games(filenames):
+    for filename in filenames:
+        with open(filename) as f:
+            yield json.load(f)
+
+
+def get_games(tournament_dir, topN=None, player_names=None, game_ids=None):
     try:
         players = pd.read_csv(tournament_dir + 'players.csv', index_col=0)
         players.columns = ['bot_name', 'score', 'final_stack', 'games']
@@ -20,39 +124,103 @@ def get_games(tournament_dir, topN=None, player_names=None):
     else:
         filter_seats = []
 
-    for filename in glob.iglob(tournament_dir + '*.json'):
-        with open(filename) as f:
-            game = json.load(f)
-            gg = False
-
-            for seat in game['seats']:
-                if names is not None:
-                    seat['name'] = names.loc[seat['name']]
-
-                seat['top_player'] = False
-                if len(filter_seats) > 0:
-                    if seat['name'] in filter_seats:
-                        gg = True
-                        seat['top_player'] = True
-                else:
+    if os.path.isfile(tournament_dir + GAME_STORE):
+        store = GameStore(tournament_dir + GAME_STORE)
+        if game_ids is None:
+            game_ids = store.ids
+
+        if len(filter_seats) > 0:
+            seat_names = filter_seats if names is None else set(names[names.isin(filter_seats)].index)
+            store_ids = set(store.find(names=seat_names))
+            game_ids = [game_id for game_id in game_ids if game_id in store_ids]
+
+        games = (store.load(game_id) for game_id in game_ids)
+    else:
+        if game_ids is None:
+            game_ids = glob.iglob(tournament_dir + '*.json')
+
+        games = _load_json_games(game_ids)
+
+    for game in games:
+        gg = False
+
+        for seat in game['seats']:
+            if names is not None:
+                seat['name'] = names.loc[seat['name']]
+
+            seat['top_player'] = False
+            if len(filter_seats) > 0:
+                if seat['name'] in filter_seats:
                     gg = True
+                    seat['top_player'] = True
+            else:
+                gg = True
 
-            if gg:
-                yield game
+        if gg:
+            yield game
 
 
 def stack_Xy(data_dir, num):
-    X = pd.read_pickle(data_dir + 'X0.pickle')
-    y = pd.read_pickle(data_dir + 'y0.pickle')
+    clear_Xy(data_dir)
+    writer = FeatureWriter(data_dir, prefix='pickle-')
+
+    for i in range(num):
+        X = pd.read_pickle(data_dir + 'X' + str(i) + '.pickle')
+        y = pd.read_pickle(data_dir + 'y' + str(i) + '.pickle')
+        writer.write(X, y)
+
+    return load_Xy(data_dir)
+
+
+class FeatureWriter(object):
+    def __init__(self, data_dir, prefix=None):
+        self.X = Dataset(data_dir + 'X')
+        self.y = Dataset(data_dir + 'y')
+        self.prefix = prefix
+        self.num = 0
+
+    def write(self, X, y):
+        name = None if self.prefix is None else self.prefix + '{:06d}'.format(self.num)
+        name = self.X.append(pd.DataFrame(X), name=name)
+        self.y.append(pd.DataFrame(y), name=name)
+        self.num += 1
+
+
+def _extract_features_chunk(args):
+    i, start, game_ids, tournament_dir, data_dir, batch_size, topN, player_names, filter_seats, filter_actions, \
+        profile_window, equity = args
+
+    writer = FeatureWriter(data_dir, prefix='{:04d}-'.format(i))
+    profiles = None if profile_window is None else OpponentProfiles(window=profile_window)
+    player = GamePlayer(writer=writer, batch_size=batch_size, profiles=profiles, equity=equity)
+    player.game_counter = start - 1
+    player.filter_seats(filter_seats)
+    player.filter_actions(filter_actions)
+
+    for game in get_games(tournament_dir, topN=topN, player_names=player_names, game_ids=game_ids):
+        player.play_game(game)
+
+    player.get_features(save_cache=False)
+
+    return writer.num
+
+
+def extract_features(tournament_dir, data_dir, num_workers=None, batch_size=10000, topN=None, player_names=None,
+                     filter_seats=None, filter_actions=None, profile_window=None, equity=False):
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
 
-    for i in range(1, num):
-        X = X.append(pd.read_pickle(data_dir + 'X' + str(i) + '.pickle'))
-        y = y.append(pd.read_pickle(data_dir + 'y' + str(i) + '.pickle'))
+    game_ids = list_games(tournament_dir)
+    chunk_size = (len(game_ids) + num_workers - 1) // num_workers
+    chunks = []
+    for i, start in enumerate(range(0, len(game_ids), chunk_size)):
+        chunks.append((i, start, game_ids[start:start + chunk_size], tournament_dir, data_dir, batch_size,
+                       topN, player_names, filter_seats, filter_actions, profile_window, equity))
 
-    X.index = range(len(X))
-    y.index = range(len(y))
+    clear_Xy(data_dir)
+    with multiprocessing.Pool(num_workers) as pool:
+        results = pool.map(_extract_features_chunk, chunks)
 
-    X.to_pickle(data_dir + 'X.pickle')
-    y.to_pickle(data_dir + 'y.pickle')
+    features.sim3_proba_cache.compact()
 
-    return X, y
+    return sum(results)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+META_FILE = '_meta.json'
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def compact_column(values):
+    values = np.asarray(values)
+
+    if values.dtype.kind == 'b':
+        return values, None
+
+    if values.dtype.kind in 'iu':
+        for dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(dtype), None
+
+    if values.dtype.kind == 'f':
+        return values.astype(np.float32), None
+
+    if all(isinstance(v, str) for v in values):
+        categories, codes = np.unique(values.astype(str), return_inverse=True)
+        codes, _ = compact_column(codes.astype(np.int64))
+        return codes, categories.tolist()
+
+    return values.astype(object), None
+
+
+class Dataset(object):
+    def __init__(self, path):
+        self.path = path.rstrip('/') + '/'
+
+    @property
+    def chunks(self):
+        if not os.path.isdir(self.path):
+            return []
+
+        return sorted(name for name in os.listdir(self.path)
+                      if not name.startswith('.') and os.path.isfile(self.path + name + '/' + META_FILE))
+
+    def meta(self, chunk):
+        with open(self.path + chunk + '/' + META_FILE) as f:
+            return json.load(f)
+
+    @property
+    def columns(self):
+        chunks = self.chunks
+        if len(chunks) == 0:
+            return []
+
+        return [c['name'] for c in self.meta(chunks[0])['columns']]
+
+    def __len__(self):
+        return sum(self.meta(chunk)['rows'] for chunk in self.chunks)
+
+    def fingerprint(self):
+        h = hashlib.sha1()
+        for chunk in self.chunks:
+            for name in sorted(os.listdir(self.path + chunk)):
+                stat = os.stat(self.path + chunk + '/' + name)
+                h.update('{}/{} {} {}\n'.format(chunk, name, stat.st_size, stat.st_mtime_ns).encode())
+
+        return h.hexdigest()
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+    def append(self, df, name=None):
+        if name is None:
+            name = '{:06d}'.format(len(self.chunks))
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.' + name + '-', dir=self.path)
+
+        try:
+            meta = {'rows': len(df), 'columns': []}
+            for i, column in enumerate(df.columns):
+                values, categories = compact_column(df[column].values)
+                filename = str(i) + '.npy'
+                np.save(tmp_dir + '/' + filename, values, allow_pickle=values.dtype.kind == 'O')
+                meta['columns'].append({
+                    'name': column,
+                    'file': filename,
+                    'dtype': values.dtype.str,
+                    'categories': categories
+                })
+
+            with open(tmp_dir + '/' + META_FILE, 'w') as f:
+                json.dump(meta, f)
+
+            os.rename(tmp_dir, self.path + name)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        return name
+
+    def read_column(self, chunk, column, rows=None):
+        path = self.path + chunk + '/' + column['file']
+
+        if rows is None or column['dtype'] == '|O':
+            values = np.load(path, allow_pickle=column['dtype'] == '|O')
+            if rows is not None:
+                values = values[rows]
+        else:
+            values = np.load(path, mmap_mode='r')
+            values = np.array(values[rows])
+
+        if column['categories'] is not None:
+            values = np.array(column['categories'], dtype=object)[values]
+
+        return values
+
+    def read(self, columns=None, rows=None):
+        chunks = self.chunks
+        metas = [self.meta(chunk) for chunk in chunks]
+        chunk_rows = [None] * len(chunks)
+        if rows is not None:
+            offsets = np.cumsum([0] + [meta['rows'] for meta in metas])
+            chunk_rows = [np.asarray(rows[offsets[i]:offsets[i + 1]]) for i in range(len(chunks))]
+
+        chunk_columns = [dict((c['name'], c) for c in meta['columns']) for meta in metas]
+        if columns is None:
+            columns = self.columns
+
+        data = {}
+        for name in columns:
+            parts = [self.read_column(chunk, c[name], r)
+                     for chunk, c, r in zip(chunks, chunk_columns, chunk_rows) if name in c]
+            if len(parts) > 0:
+                data[name] = np.concatenate(parts)
+
+        return pd.DataFrame(data, columns=columns)
+
+
+def clear_Xy(data_dir):
+    Dataset(data_dir + 'X').clear()
+    Dataset(data_dir + 'y').clear()
+
+
+def load_Xy(data_dir, columns=None, **where):
+    X = Dataset(data_dir + 'X')
+    y = Dataset(data_dir + 'y')
+
+    rows = None
+    if len(where) > 0:
+        y_where = y.read(columns=list(where))
+        rows = np.ones(len(y_where), dtype=bool)
+        for column, value in where.items():
+            rows &= (y_where[column] == value).values
+
+    X = X.read(columns=columns, rows=rows)
+    y = y.read(rows=rows)
+
+    return X, y
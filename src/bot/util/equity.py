@@ -0,0 +1,427 @@
+from .evaluator import STRAIGHT_LOW, card_index, encode_cards
+from .evaluator import HIGHCARD, ONEPAIR, TWOPAIR, THREECARD, STRAIGHT, FLASH, FULLHOUSE, FOURCARD, STRAIGHTFLASH
+import collections
+import fcntl
+import itertools
+import os
+import time
+import numpy as np
+
+
+SUIT_PERMUTATIONS = list(itertools.permutations(range(4)))
+TABLE_DTYPE = np.dtype([('key', '<u8'), ('proba', '<f4')])
+STRAIGHT_LOW_ARRAY = np.array(STRAIGHT_LOW, dtype=np.int32)
+BIT_COUNT = np.array([bin(mask).count('1') for mask in range(1 << 13)], dtype=np.int32)
+TOP_RANK = np.array([mask.bit_length() + 1 if mask else 0 for mask in range(1 << 13)], dtype=np.int32)
+LOW_RANK = np.array([(mask & -mask).bit_length() + 1 if mask else 0 for mask in range(1 << 13)], dtype=np.int32)
+MAX_BATCH_CARDS = 1 << 22
+DEFAULT_STEP_TIME = 0.005
+
+step_times = {}
+
+
+def canonical_key(hole, community):
+    hole = [card_index(c) for c in hole]
+    community = [card_index(c) for c in community]
+    best = None
+
+    for perm in SUIT_PERMUTATIONS:
+        cards = sorted([c & ~3 | perm[c & 3] for c in hole]) + sorted([c & ~3 | perm[c & 3] for c in community])
+        if best is None or cards < best:
+            best = cards
+
+    key = 0
+    for c in best:
+        key = key << 6 | (c + 1)
+
+    return key
+
+
+class EquityTable(object):
+    def __init__(self, path):
+        self.table = np.load(path, mmap_mode='r')
+        self.keys = self.table['key']
+        self.probas = self.table['proba']
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key, default=None):
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i < len(self.keys) and self.keys[i] == key:
+            return float(self.probas[i])
+
+        return default
+
+    def items(self):
+        return zip(self.keys.tolist(), self.probas.tolist())
+
+    @staticmethod
+    def save(path, probas):
+        table = np.empty(len(probas), dtype=TABLE_DTYPE)
+        table['key'] = list(probas.keys())
+        table['proba'] = list(probas.values())
+        table.sort(order='key')
+        np.save(path, table)
+
+
+def parse_log(data):
+    return np.frombuffer(data[:len(data) - len(data) % TABLE_DTYPE.itemsize], dtype=TABLE_DTYPE)
+
+
+class EquityCache(object):
+    def __init__(self, path, max_size=200000):
+        self.path = path
+        self.max_size = max_size
+        self.table = load_equity_table(path + '.npy')
+        self.entries = collections.OrderedDict()
+        self.log = None
+
+        for key, proba in self.read_log()[-max_size:].tolist():
+            self.entries[key] = proba
+
+    def __len__(self):
+        return len(self.entries) + (0 if self.table is None else len(self.table))
+
+    def read_log(self):
+        try:
+            with open(self.path + '.log', 'rb') as f:
+                return parse_log(f.read())
+        except FileNotFoundError:
+            return parse_log(b'')
+
+    def open_log(self):
+        if self.log is None:
+            self.log = open(self.path + '.log', 'ab', buffering=0)
+
+    def get(self, key, default=None):
+        proba = self.entries.get(key)
+        if proba is not None:
+            self.entries.move_to_end(key)
+            return proba
+
+        if self.table is not None:
+            return self.table.get(key, default)
+
+        return default
+
+    def update(self, probas):
+        for key, proba in probas.items():
+            self.entries[key] = float(np.float32(proba))
+            self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+        if self.log is not None and len(probas) > 0:
+            records = np.empty(len(probas), dtype=TABLE_DTYPE)
+            records['key'] = list(probas.keys())
+            records['proba'] = list(probas.values())
+            fcntl.flock(self.log, fcntl.LOCK_SH)
+            try:
+                self.log.write(records.tobytes())
+            finally:
+                fcntl.flock(self.log, fcntl.LOCK_UN)
+
+    def compact(self):
+        probas = {} if self.table is None else dict(self.table.items())
+
+        with open(self.path + '.log', 'a+b') as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            log.seek(0)
+            for key, proba in parse_log(log.read()).tolist():
+                probas[key] = proba
+            probas.update(self.entries)
+
+            if len(probas) == 0:
+                return 0
+
+            tmp_path = self.path + '.tmp.npy'
+            EquityTable.save(tmp_path, probas)
+            os.replace(tmp_path, self.path + '.npy')
+            log.truncate(0)
+
+        self.table = load_equity_table(self.path + '.npy')
+
+        return len(probas)
+
+
+def load_equity_table(*paths):
+    for path in paths:
+        try:
+            return EquityTable(path)
+        except FileNotFoundError:
+            pass
+
+    return None
+
+
+def eval_hands(cards):
+    cards = np.asarray(cards, dtype=np.int32)
+    ranks = cards >> 2
+    suits = cards & 3
+    bits = np.left_shift(1, ranks)
+
+    seen = [np.zeros(cards.shape[:-1], dtype=np.int32) for _ in range(4)]
+    suit_masks = [np.zeros(cards.shape[:-1], dtype=np.int32) for _ in range(4)]
+    for i in range(cards.shape[-1]):
+        b = bits[..., i]
+        for n in range(3, 0, -1):
+            seen[n] |= seen[n - 1] & b
+        seen[0] |= b
+        for s in range(4):
+            suit_masks[s] |= np.where(suits[..., i] == s, b, 0)
+
+    flush_mask = np.zeros(cards.shape[:-1], dtype=np.int32)
+    for s in range(4):
+        flush_mask = np.where(BIT_COUNT[suit_masks[s]] >= 5, suit_masks[s], flush_mask)
+
+    pairs = seen[1] & ~seen[2]
+    threes = seen[2]
+    num_threes = BIT_COUNT[threes]
+    num_pairs = BIT_COUNT[pairs]
+    pair_rank = TOP_RANK[pairs]
+    three_rank = TOP_RANK[threes]
+    full_pair_rank = np.where(num_threes == 2, np.maximum(pair_rank, LOW_RANK[threes]), pair_rank)
+    straight_flush = STRAIGHT_LOW_ARRAY[flush_mask]
+    straight = STRAIGHT_LOW_ARRAY[seen[0]]
+
+    hole = np.sort(ranks[..., :2], axis=-1) + 2
+    hole_flg = hole[..., 1] << 4 | hole[..., 0]
+
+    flag = np.select([
+        straight_flush != -1,
+        seen[3] != 0,
+        (num_threes > 0) & (full_pair_rank > 0),
+        flush_mask != 0,
+        straight != -1,
+        num_threes > 0,
+        num_pairs >= 2,
+        num_pairs == 1
+    ], [
+        STRAIGHTFLASH | straight_flush << 4,
+        FOURCARD | LOW_RANK[seen[3]] << 4,
+        FULLHOUSE | three_rank << 4 | full_pair_rank,
+        FLASH | TOP_RANK[flush_mask] << 4,
+        STRAIGHT | straight << 4,
+        THREECARD | three_rank << 4,
+        TWOPAIR | pair_rank << 4 | TOP_RANK[pairs & ~(1 << np.maximum(pair_rank - 2, 0))],
+        ONEPAIR | pair_rank << 4
+    ], default=HIGHCARD)
+    flag = np.where(flag == HIGHCARD, hole_flg, flag)
+
+    return flag << 8 | hole_flg
+
+
+def _deal(decks, num, n_sims):
+    deck = np.repeat(decks, n_sims, axis=0)
+    rows = np.arange(len(deck))
+
+    for i in range(num):
+        j = np.random.randint(i, deck.shape[1], size=len(deck))
+        card = deck[rows, j]
+        deck[rows, j] = deck[:, i]
+        deck[:, i] = card
+
+    return deck[:, :num].reshape(len(decks), n_sims, num)
+
+
+def batch_win_rate(holes, boards, n_players=3, n_sims=100):
+    rates = np.zeros(len(holes))
+    groups = {}
+    for i, board in enumerate(boards):
+        groups.setdefault(len(board), []).append(i)
+
+    for board_len, idx in groups.items():
+        need = 5 - board_len
+        num = need + (n_players - 1) * 2
+        chunk = max(1, MAX_BATCH_CARDS // (n_sims * 52))
+
+        for start in range(0, len(idx), chunk):
+            spots = idx[start:start + chunk]
+            known = np.array([encode_cards(holes[i]) + encode_cards(boards[i]) for i in spots], dtype=np.int32)
+            unused = np.ones((len(spots), 52), dtype=bool)
+            np.put_along_axis(unused, known, False, axis=1)
+            decks = np.nonzero(unused)[1].reshape(len(spots), -1).astype(np.int32)
+
+            dealt = _deal(decks, num, n_sims)
+            board = np.concatenate([np.broadcast_to(known[:, None, 2:], (len(spots), n_sims, board_len)),
+                                    dealt[..., :need]], axis=-1)
+            hole = np.broadcast_to(known[:, None, :2], (len(spots), n_sims, 2))
+
+            my_score = eval_hands(np.concatenate([hole, board], axis=-1))
+            win = np.ones(my_score.shape, dtype=bool)
+            for i in range(n_players - 1):
+                opponent = dealt[..., need + i * 2:need + i * 2 + 2]
+                win &= eval_hands(np.concatenate([opponent, board], axis=-1)) <= my_score
+
+            rates[spots] = win.mean(axis=-1)
+
+    return rates
+
+
+def calibrate_win_rate(n_players=3, step=100, repeats=3):
+    batch_win_rate([['SA', 'HK']], [['D2', 'C7', 'S9']], n_players, step)
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        batch_win_rate([['SA', 'HK']], [['D2', 'C7', 'S9']], n_players, step)
+        times.append(time.perf_counter() - start)
+
+    step_times[(n_players, step)] = max(times)
+
+
+def anytime_win_rate(hole, community, deadline, n_players=3, step=100, max_sims=1000):
+    rate = 0.0
+    sims = 0
+    key = (n_players, step)
+    step_time = step_times.get(key, DEFAULT_STEP_TIME)
+
+    while sims < max_sims and time.perf_counter() + step_time < deadline:
+        start = time.perf_counter()
+        step_rate = batch_win_rate([hole], [community], n_players, step)[0]
+        rate += (step_rate - rate) * step / (sims + step)
+        sims += step
+        step_time = time.perf_counter() - start
+        step_times[key] = (step_times.get(key, step_time) + step_time) / 2
+
+    if sims == 0:
+        step_times[key] = step_time * 0.9
+
+    return rate, sims
+
+
+def get_flop_runouts(board, deck, matchings=2):
+    rs = np.random.RandomState(int(np.dot(np.sort(board), [52 * 52, 52, 1])))
+    pairs = np.stack([np.tile(deck, matchings), np.concatenate([rs.permutation(deck) for _ in range(matchings)])], axis=1)
+    pairs = np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1)
+
+    return np.unique(pairs, axis=0).astype(np.int32)
+
+
+# Heads-up equity is exact on the turn and river. On the flop every remaining card is paired with random
+# partners in `matchings` rounds, seeded by the board: 2 rounds (~93 runouts) are within 0.014 RMS of exact.
+# Against 2 opponents the disjoint hand pairs are counted exactly per runout; against 3+ they are sampled
+# jointly, seeded by board and hole. Building a flop board takes ~50 ms, outside the sim3 budget.
+class BoardEquity(object):
+    def __init__(self, board, matchings=2):
+        board = encode_cards(board)
+        deck = np.setdiff1d(np.arange(52, dtype=np.int32), board)
+        need = 5 - len(board)
+
+        if need == 2:
+            runouts = get_flop_runouts(board, deck, matchings)
+        elif need > 0:
+            runouts = np.array(list(itertools.combinations(deck, need)), dtype=np.int32)
+        else:
+            runouts = np.zeros((1, 0), dtype=np.int32)
+
+        self.board = board
+        self.deck = deck
+        self.hands = np.array(list(itertools.combinations(deck, 2)), dtype=np.int32)
+        self.hand_cards = np.zeros((len(self.hands), 52), dtype=bool)
+        np.put_along_axis(self.hand_cards, self.hands, True, axis=1)
+        self.hand_index = np.zeros((52, 52), dtype=np.int32)
+        self.hand_index[self.hands[:, 0], self.hands[:, 1]] = np.arange(len(self.hands))
+        self.hand_index[self.hands[:, 1], self.hands[:, 0]] = np.arange(len(self.hands))
+        self.runout_cards = np.zeros((len(runouts), 52), dtype=bool)
+        np.put_along_axis(self.runout_cards, runouts, True, axis=1)
+
+        self.boards = np.concatenate([np.broadcast_to(np.array(board, dtype=np.int32), (len(runouts), len(board))),
+                                      runouts], axis=1)
+        self.valid = ~self.hand_cards[:, runouts].any(axis=-1).T
+        self.scores = eval_hands(np.concatenate([
+            np.broadcast_to(self.hands[None], (len(runouts),) + self.hands.shape),
+            np.broadcast_to(self.boards[:, None], (len(runouts), len(self.hands), 5))
+        ], axis=-1))
+
+    def win_rate(self, hole, n_opponents=(1,)):
+        hole = encode_cards(hole)
+        runouts = ~self.runout_cards[:, hole].any(axis=1)
+        boards = self.boards[runouts]
+        hero = eval_hands(np.concatenate([np.broadcast_to(np.array(hole, dtype=np.int32), (len(boards), 2)), boards],
+                                         axis=1))
+
+        valid = self.valid[runouts] & ~self.hand_cards[:, hole].any(axis=1)
+        beaten = (self.scores[runouts] <= hero[:, None]) & valid
+
+        rates = []
+        for n in n_opponents:
+            if n == 1:
+                rate = beaten.sum(axis=1) / valid.sum(axis=1)
+            elif n == 2:
+                rate = self.disjoint_pairs(beaten) / self.disjoint_pairs(valid)
+            else:
+                rate = self.sample_win_rate(hole, runouts, hero, n)
+            rates.append(float(np.mean(rate)))
+
+        return rates
+
+    def disjoint_pairs(self, hands):
+        per_card = hands.astype(np.float64).dot(self.hand_cards)
+        num = hands.sum(axis=1)
+
+        return num * num - (per_card * per_card).sum(axis=1) + num
+
+    def sample_win_rate(self, hole, runouts, hero, n, samples=4096):
+        used = self.runout_cards[runouts][:, self.deck]
+        used |= np.isin(self.deck, hole)
+        cards = np.broadcast_to(self.deck, used.shape)[~used].reshape(len(used), -1)
+
+        seed = 0
+        for card in sorted(self.board) + sorted(hole):
+            seed = seed * 52 + card
+        rs = np.random.RandomState(seed % (1 << 32))
+
+        draws = max(1, samples // len(cards))
+        dealt = np.argpartition(rs.random_sample((len(cards), draws, cards.shape[1])), 2 * n - 1, axis=2)[:, :, :2 * n]
+        dealt = np.take_along_axis(cards[:, None, :], dealt, axis=2).reshape(len(cards), draws, n, 2)
+        hands = self.hand_index[dealt[..., 0], dealt[..., 1]]
+
+        scores = self.scores[runouts][np.arange(len(cards))[:, None, None], hands]
+
+        return (scores <= hero[:, None, None]).all(axis=2).mean(axis=1)
+
+
+def get_game_spots(game, uuids=None):
+    for r in game['rounds']:
+        round_state = r['round_state']
+        for seat in round_state['seats']:
+            if uuids is None or seat['uuid'] in uuids:
+                for street, num in [('flop', 3), ('turn', 4), ('river', 5)]:
+                    if street in round_state['action_histories']:
+                        yield seat['hole_card'], round_state['community_card'][:num]
+
+
+def build_equity_table(games, path, nb_simulation=1000, nb_player=3, base=None):
+    probas = {} if base is None else dict(base.items())
+    spots = {}
+
+    for game in games:
+        for hole, community in get_game_spots(game):
+            spots[canonical_key(hole, community)] = (hole, community)
+
+    missing = [(key, hole, community) for key, (hole, community) in spots.items() if key not in probas]
+    if len(missing) > 0:
+        keys, holes, boards = zip(*missing)
+        probas.update(zip(keys, batch_win_rate(holes, boards, nb_player, nb_simulation).tolist()))
+
+    EquityTable.save(path, probas)
+
+    return len(probas)
+
+
+if __name__ == '__main__':
+    import argparse
+    from .data import get_games
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('tournament_dirs', nargs='+')
+    parser.add_argument('--out', default='data/sim3_proba.npy')
+    parser.add_argument('--nb-simulation', type=int, default=1000)
+    args = parser.parse_args()
+
+    base = load_equity_table(args.out)
+    games = (game for tournament_dir in args.tournament_dirs for game in get_games(tournament_dir))
+    print('Spots: ' + str(build_equity_table(games, args.out, nb_simulation=args.nb_simulation, base=base)))
@@ -0,0 +1,144 @@
+import itertools
+
+
+RANKS = '23456789TJQKA'
+SUITS = 'CDHS'
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+
+HIGHCARD = 0
+ONEPAIR = 1 << 8
+TWOPAIR = 1 << 9
+THREECARD = 1 << 10
+STRAIGHT = 1 << 11
+FLASH = 1 << 12
+FULLHOUSE = 1 << 13
+FOURCARD = 1 << 14
+STRAIGHTFLASH = 1 << 15
+
+HAND_STRENGTH_MAP = {
+    HIGHCARD: 'HIGHCARD',
+    ONEPAIR: 'ONEPAIR',
+    TWOPAIR: 'TWOPAIR',
+    THREECARD: 'THREECARD',
+    STRAIGHT: 'STRAIGHT',
+    FLASH: 'FLASH',
+    FULLHOUSE: 'FULLHOUSE',
+    FOURCARD: 'FOURCARD',
+    STRAIGHTFLASH: 'STRAIGHTFLASH'
+}
+
+CARD_RANK = [c // 4 + 2 for c in range(52)]
+CARD_SUIT = [2 << (c % 4) for c in range(52)]
+CARD_PRIME = [PRIMES[c // 4] for c in range(52)]
+CARD_BIT = [1 << (c // 4) for c in range(52)]
+CARD_INDEX = {SUITS[c % 4] + RANKS[c // 4]: c for c in range(52)}
+
+
+def card_index(card):
+    return CARD_INDEX[card]
+
+
+def encode_cards(cards):
+    return [CARD_INDEX[c] for c in cards]
+
+
+def _straight_low(mask):
+    rank = -1
+    for r in range(9):
+        if (mask >> r) & 31 == 31:
+            rank = r + 2
+
+    return rank
+
+
+def _rank_flag(cards):
+    counts = [0] * 13
+    for c in cards:
+        counts[c // 4] += 1
+
+    for r in range(13):
+        if counts[r] >= 4:
+            return FOURCARD | (r + 2) << 4
+
+    threes = [r + 2 for r in range(13) if counts[r] >= 3]
+    pairs = [r + 2 for r in range(13) if counts[r] == 2]
+    if len(threes) == 2:
+        pairs.append(min(threes))
+    if len(threes) > 0 and len(pairs) > 0:
+        return FULLHOUSE | max(threes) << 4 | max(pairs)
+
+    low = STRAIGHT_LOW[sum(1 << r for r in range(13) if counts[r] > 0)]
+    if low != -1:
+        return STRAIGHT | low << 4
+
+    if len(threes) > 0:
+        return THREECARD | max(threes) << 4
+
+    if len(pairs) >= 2:
+        pairs = sorted(pairs)[::-1]
+        return TWOPAIR | pairs[0] << 4 | pairs[1]
+
+    if len(pairs) == 1:
+        return ONEPAIR | pairs[0] << 4
+
+    return HIGHCARD
+
+
+STRAIGHT_LOW = [_straight_low(mask) for mask in range(1 << 13)]
+RANK_FLAGS = {}
+
+
+def eval_hand(hole, community):
+    if len(hole) == 2:
+        h1 = CARD_RANK[hole[0]]
+        h2 = CARD_RANK[hole[1]]
+        hole_flg = h2 << 4 | h1 if h1 < h2 else h1 << 4 | h2
+    else:
+        ranks = sorted(CARD_RANK[c] for c in hole)
+        hole_flg = ranks[1] << 4 | ranks[0]
+
+    product = 1
+    suits = [0, 0, 0, 0]
+    for c in itertools.chain(hole, community):
+        product *= CARD_PRIME[c]
+        suits[c & 3] += 1
+
+    flag = RANK_FLAGS.get(product)
+    if flag is None:
+        flag = RANK_FLAGS[product] = _rank_flag(itertools.chain(hole, community))
+
+    if len(hole) + len(community) >= 5:
+        for s in range(4):
+            if suits[s] >= 5:
+                mask = 0
+                for c in itertools.chain(hole, community):
+                    if c & 3 == s:
+                        mask |= CARD_BIT[c]
+
+                low = STRAIGHT_LOW[mask]
+                if low != -1:
+                    flag = STRAIGHTFLASH | low << 4
+                elif flag < FULLHOUSE:
+                    flag = FLASH | (mask.bit_length() + 1) << 4
+                break
+
+    if flag == HIGHCARD:
+        flag = hole_flg
+
+    return flag << 8 | hole_flg
+
+
+def gen_hand_rank_info(hole, community):
+    hand = eval_hand(hole, community)
+
+    return {
+        'hand': {
+            'strength': HAND_STRENGTH_MAP[(hand >> 16) << 8],
+            'high': (hand >> 12) & 15,
+            'low': (hand >> 8) & 15
+        },
+        'hole': {
+            'high': (hand >> 4) & 15,
+            'low': hand & 15
+        }
+    }
@@ -1,18 +1,53 @@
-from pypokerengine.engine.hand_evaluator import HandEvaluator
-from pypokerengine.utils.card_utils import gen_cards, estimate_hole_card_win_rate
-import copy
-import pandas as pd
+from .evaluator import RANKS, CARD_RANK, CARD_SUIT, encode_cards, eval_hand, gen_hand_rank_info
+from .equity import EquityCache, BoardEquity, canonical_key, load_equity_table, anytime_win_rate, batch_win_rate
+from .equity import get_game_spots
+from .instrument import count, timed
+import os
+import sys
 import time
-import pickle
+import numpy as np
 
 
-sim3_proba_cache = {}
+DATA_DIR = 'data/' if os.path.isfile('data/preflop_odds.txt') else 'src/data/'
 
-try:
-    preflop_odds = pd.read_csv('data/preflop_odds.txt', sep='\t', index_col=0)
-except FileNotFoundError:
-    preflop_odds = pd.read_csv('src/data/preflop_odds.txt', sep='\t', index_col=0)
-preflop_odds.columns = range(1, 10)
+sim3_proba_table = load_equity_table(DATA_DIR + 'sim3_proba.npy')
+sim3_proba_cache = EquityCache(DATA_DIR + 'sim3_proba_cache')
+last_board = [None, None]
+last_equity = [None, None]
+
+
+def get_hand_name(c1, c2):
+    r1 = c1 // 4
+    r2 = c2 // 4
+
+    if r1 == r2:
+        return RANKS[r1] + RANKS[r2]
+
+    name = RANKS[r1] + RANKS[r2] if r1 > r2 else RANKS[r2] + RANKS[r1]
+    return name + ('s' if c1 % 4 == c2 % 4 else 'o')
+
+
+def load_preflop_odds(path):
+    hands = {}
+    odds = []
+
+    with open(path) as f:
+        f.readline()
+        for line in f:
+            values = line.split('\t')
+            hands[values[0]] = len(odds)
+            odds.append([100.0] + [float(v) for v in values[1:]])
+
+    hand_class = np.full((52, 52), -1, dtype=np.int16)
+    for c1 in range(52):
+        for c2 in range(52):
+            if c1 != c2:
+                hand_class[c1, c2] = hands[get_hand_name(c1, c2)]
+
+    return hand_class, np.array(odds)
+
+
+preflop_hand_class, preflop_odds = load_preflop_odds(DATA_DIR + 'preflop_odds.txt')
 
 
 class Profiler(object):
@@ -23,7 +58,7 @@ class Profiler(object):
 
     def __exit__(self, type, value, traceback):
         Profiler.bank += time.time() - self._startTime
-        print("Elapsed time: {:.3f} sec".format(Profiler.bank))
+        sys.stderr.write("Elapsed time: {:.3f} sec\n".format(Profiler.bank))
 
 
 def norm_rounds(i, max_round):
@@ -33,26 +68,10 @@ def norm_rounds(i, max_round):
     return int(10 + (i - 10) * (40 / (max_round - 10)))
 
 
-def get_card_preflop_odds(cards, num_players):
-    c1 = cards[0]
-    c2 = cards[1]
-    c1_name = str(c1)[1]
-    c2_name = str(c2)[1]
-
-    if c1_name == c2_name:
-        cards_name = c1_name + c2_name
-    else:
-        cards_name = c1_name + c2_name if c1.rank > c2.rank else c2_name + c1_name
-        cards_name += 's' if c1.suit == c2.suit else 'o'
-
-    global preflop_odds
-
-    try:
-        odds = preflop_odds.loc[cards_name][min(2, num_players - 1)]
-    except Exception:
-        odds = 0
+def get_card_preflop_odds(hole, num_players):
+    c1, c2 = encode_cards(hole)
 
-    return odds
+    return preflop_odds[preflop_hand_class[c1, c2], max(0, min(2, num_players - 1))]
 
 
 def get_card_sub_features(cards):
@@ -61,17 +80,19 @@ def get_card_sub_features(cards):
     suits = {}
 
     for c in cards:
-        max_rank = max(max_rank, c.rank)
+        rank = CARD_RANK[c]
+        suit = CARD_SUIT[c]
+        max_rank = max(max_rank, rank)
         
-        if c.rank not in ranks:
-            ranks[c.rank] = 1
+        if rank not in ranks:
+            ranks[rank] = 1
         else:
-            ranks[c.rank] += 1
+            ranks[rank] += 1
 
-        if c.suit not in suits:
-            suits[c.suit] = 1
+        if suit not in suits:
+            suits[suit] = 1
         else:
-            suits[c.suit] += 1
+            suits[suit] += 1
 
     f = {
         'max_rank': max_rank
@@ -97,26 +118,81 @@ def get_card_sub_features(cards):
     return f
 
 
-def get_card_features(hole, community):
-    hole_card = gen_cards(hole)
-    community_card = gen_cards(community)
+def get_sim3_proba(hole, community, deadline=None):
+    key = canonical_key(hole, community)
 
-    e = HandEvaluator.gen_hand_rank_info(hole_card, community_card)
+    if sim3_proba_table is not None:
+        proba = sim3_proba_table.get(key)
+        if proba is not None:
+            count('sim3.table_hit')
+            return proba
 
-    if len(community_card) > 0:
-        e2 = HandEvaluator.gen_hand_rank_info(community_card, [])
+    proba = sim3_proba_cache.get(key)
+    if proba is not None:
+        count('sim3.cache_hit')
+        return proba
+
+    count('sim3.miss')
+    if deadline is None:
+        proba = batch_win_rate([hole], [community], 3, 100).tolist()[0]
     else:
-        e2 = {'hand': {'high': 0, 'strength': 'HIGHCARD'}}
+        proba, sims = anytime_win_rate(hole, community, deadline, 3)
+        if sims == 0:
+            count('sim3.fallback')
+            return None
+
+    sim3_proba_cache.update({key: proba})
+
+    return sim3_proba_cache.get(key)
+
+
+def prefetch_sim3_proba(spots):
+    missing = {}
+    for hole, community in spots:
+        key = canonical_key(hole, community)
+        if key in missing or sim3_proba_cache.get(key) is not None:
+            continue
+
+        if sim3_proba_table is not None and sim3_proba_table.get(key) is not None:
+            continue
+
+        missing[key] = (hole, community)
+
+    if len(missing) > 0:
+        count('sim3.prefetch', len(missing))
+        holes, boards = zip(*missing.values())
+        sim3_proba_cache.update(dict(zip(missing.keys(), batch_win_rate(holes, boards, 3, 100).tolist())))
+
+
+def get_board_features(community):
+    key = tuple(community)
+    if last_board[0] != key:
+        community_card = encode_cards(community)
+        if len(community_card) > 0:
+            hand = gen_hand_rank_info(community_card, [])['hand']
+        else:
+            hand = {'high': 0, 'strength': 'HIGHCARD'}
+
+        last_board[0] = key
+        last_board[1] = (community_card, hand, get_card_sub_features(community_card))
+
+    return last_board[1]
+
+
+def get_card_features(hole, community, sim3=True):
+    hole_card = encode_cards(hole)
+    community_card, community_hand, community_subf = get_board_features(community)
+
+    e = gen_hand_rank_info(hole_card, community_card)
 
     f = {
         'hand_high': e['hand']['high'],
         'hand_strength': e['hand']['strength'],
-        'hand_community_high': e2['hand']['high'],
-        'hand_community_strength': e2['hand']['strength']
+        'hand_community_high': community_hand['high'],
+        'hand_community_strength': community_hand['strength']
     }
 
-    for name, cards in [('hole', hole_card), ('community', community_card)]:
-        subf = get_card_sub_features(cards)
+    for name, subf in [('hole', get_card_sub_features(hole_card)), ('community', community_subf)]:
         for k in subf:
             f[name + '_' + k] = subf[k]
 
@@ -125,13 +201,8 @@ def get_card_features(hole, community):
     del f['hole_num3_max_rank']
     del f['hole_num4_max_rank']
 
-    if len(community_card) > 0:
-        cache_key = ''.join(sorted(hole) + sorted(community))
-        if cache_key in sim3_proba_cache:
-            f['sim3_proba'] = sim3_proba_cache[cache_key]
-        else:
-            proba = estimate_hole_card_win_rate(nb_simulation=100, nb_player=3, hole_card=hole_card, community_card=community_card)
-            sim3_proba_cache[cache_key] = f['sim3_proba'] = proba
+    if len(community_card) > 0 and sim3:
+        f['sim3_proba'] = get_sim3_proba(hole, community)
     else:
         f['sim3_proba'] = 0
 
@@ -144,6 +215,7 @@ def on_cards_change(features, player_uuid):
         features['card_' + f] = card_features[f]
 
 
+@timed('features.on_game_start')
 def on_game_start(features, player_uuid, game_info):
     features['small_blind_amount'] = game_info['rule']['small_blind_amount']
     features['initial_stack'] = game_info['rule']['initial_stack']
@@ -195,6 +267,7 @@ def reg_player(features, uuid):
     return player
 
 
+@timed('features.on_round_start')
 def on_round_start(features, player_uuid, round_count, hole_card, seats):
     features['round_count'] = round_count
     features['hole_card'] = hole_card
@@ -216,6 +289,7 @@ def on_round_start(features, player_uuid, round_count, hole_card, seats):
                 player[action + '_in_' + street] = 0
 
 
+@timed('features.on_street_start')
 def on_street_start(features, player_uuid, street, round_state):
     features['street'] = street
 
@@ -246,6 +320,7 @@ def on_street_start(features, player_uuid, street, round_state):
                 player[action + '_in_street'] = 0
 
 
+@timed('features.on_player_action')
 def on_player_action(features, player_uuid, action):
     player = features['players'][action['player_uuid']]
     a = action['action']
@@ -263,6 +338,7 @@ def on_player_action(features, player_uuid, action):
         player[a + '_' + street + 's'] += 1
 
 
+@timed('features.on_declare_action')
 def on_declare_action(features, player_uuid, valid_actions, round_state):
     features['pot'] = round_state['pot']['main']['amount']
     features['call_amount'] = valid_actions[1]['amount']
@@ -275,6 +351,7 @@ def on_declare_action(features, player_uuid, valid_actions, round_state):
         player['state'] = seat['state']
 
 
+@timed('features.on_round_result')
 def on_round_result(features, player_uuid, winners, hand_info):
     winner_uuids = []
 
@@ -301,10 +378,33 @@ def on_round_result(features, player_uuid, winners, hand_info):
                 player['hand_hole_pairs'] = 0
 
 
+def get_card_equity(hole, community, n_opponents):
+    if len(community) == 0:
+        return [0, 0]
+
+    key = tuple(community)
+    if last_equity[0] != key:
+        last_equity[0] = key
+        last_equity[1] = BoardEquity(community)
+
+    return last_equity[1].win_rate(hole, (1, max(1, n_opponents)))
+
+
+def get_live_opponents(round_state, player_uuid):
+    return sum(1 for seat in round_state['seats'] if seat['uuid'] != player_uuid and seat['state'] != 'folded')
+
+
+def on_card_equity(features, player_uuid, round_state):
+    n_opponents = get_live_opponents(round_state, player_uuid)
+    equity = get_card_equity(features['hole_card'], features['community_card'], n_opponents)
+    features['card_equity'], features['card_equity_live'] = equity
+
+
 def win_eval(holes, community_card):
-    return max([HandEvaluator.eval_hand(gen_cards(h), community_card) for h in holes])
+    return max([eval_hand(encode_cards(h), community_card) for h in holes])
 
 
+@timed('features.clean_features')
 def clean_features(data):
     max_players = 6
     strength = ["HIGHCARD", "ONEPAIR", "TWOPAIR", "THREECARD", "STRAIGHT", "FLASH", "FULLHOUSE", "FOURCARD", "STRAIGHTFLASH"]
@@ -344,7 +444,7 @@ def clean_features(data):
             player['to_left'] = 1 if player['num'] - X['player_num'] < 0 else 0
 
         if X['preflop_odds'] == 0:
-            X['preflop_odds'] = round(get_card_preflop_odds(gen_cards(X['hole_card']), X['players_in_game']), 1)
+            X['preflop_odds'] = round(get_card_preflop_odds(X['hole_card'], X['players_in_game']), 1)
 
         sorted_players = sorted(X['players'].values(), key=lambda x: (-x['me'], -x['in_round'], -x['to_left'], -x['num']))
         for i, player in enumerate(sorted_players[:max_players]):
@@ -392,7 +492,7 @@ def clean_features(data):
             X['private_round_end_stack_diff'] = int(round(X['private_round_end_stack_diff'] / X['small_blind_amount']))
             X['private_round_end_stack'] = int(round(X['private_round_end_stack'] / X['small_blind_amount']))
 
-            community_card = gen_cards(X['private_community_card'])
+            community_card = encode_cards(X['private_community_card'])
             my_hand = win_eval([X['private_hole_card']], community_card)
             if len(X['private_opponent_hole_card']) > 0:
                 op_hand = win_eval(X['private_opponent_hole_card'], community_card)
@@ -415,26 +515,50 @@ def clean_features(data):
     return data, privates
 
 
+def is_top_player(features):
+    return features['private_bot_top']
+
+
 class GamePlayer(object):
-    def __init__(self):
-        self.data = []
+    def __init__(self, writer=None, batch_size=10000, profiles=None, equity=False):
+        from .batch import FeatureBatch
+
+        self.batch = FeatureBatch(profiles, equity)
         self.i = 1
         self._filter_actions = None
         self._filter_seats = None
         self.game_counter = -1
+        self.writer = writer
+        self.batch_size = batch_size
+        self.profiles = profiles
+        self.equity = equity
+
+        if writer is not None:
+            sim3_proba_cache.open_log()
+
+    def get_features(self, save_cache=True):
+        if self.writer is not None:
+            self.flush()
+            X, y = None, None
+        else:
+            X, y = self.batch.get_features()
+            self.batch.clear()
+
+        if save_cache:
+            sim3_proba_cache.compact()
 
-        global sim3_proba_cache
-        with open('src/data/sim3_proba_cache.pickle', 'rb') as f:
-            sim3_proba_cache = pickle.load(f)
+        return X, y
 
-    def get_features(self):
-        X, y = clean_features(self.data)
+    def add_features(self, features):
+        self.batch.append(features)
 
-        global sim3_proba_cache
-        with open('src/data/sim3_proba_cache.pickle', 'wb') as f:
-            pickle.dump(sim3_proba_cache, f)
+        if self.writer is not None and len(self.batch) >= self.batch_size:
+            self.flush()
 
-        return pd.DataFrame(X), pd.DataFrame(y)
+    def flush(self):
+        if len(self.batch) > 0:
+            self.writer.write(*self.batch.get_features())
+            self.batch.clear()
 
     def filter_actions(self, func):
         self._filter_actions = func
@@ -473,6 +597,11 @@ class GamePlayer(object):
         for uuid in features:
             on_game_start(features[uuid], uuid, game)
 
+        if self.profiles is not None:
+            self.profiles.on_game_start(game)
+
+        prefetch_sim3_proba(get_game_spots(game, features))
+
         for r in game['rounds']:
             seats = {}
             hole_cards = {}
@@ -504,10 +633,18 @@ class GamePlayer(object):
             for uuid in features:
                 on_round_start(features[uuid], uuid, r['round_state']['round_count'], hole_cards[uuid], r['round_state']['seats'])
 
+            if self.profiles is not None:
+                self.profiles.on_round_start(r['round_state']['seats'])
+
             for st in ['preflop', 'flop', 'turn', 'river']:
                 if st in r['round_state']['action_histories']:
                     for uuid in features:
                         on_street_start(features[uuid], uuid, st, r['round_state'])
+                        if self.equity:
+                            on_card_equity(features[uuid], uuid, r['round_state'])
+
+                    if self.profiles is not None:
+                        self.profiles.on_street_start(st)
 
                     for a in r['round_state']['action_histories'][st]:
                         uuid = a['uuid']
@@ -532,7 +669,7 @@ class GamePlayer(object):
                                         player_features['private_bot_action'] = a['action']
                                         player_features['private_bot_action_amount'] = a['amount'] if 'amount' in a else 0
                                         if not self._filter_actions or self._filter_actions(player_features):
-                                            self.data.append(copy.deepcopy(player_features))
+                                            self.add_features(player_features)
 
                                             self.i += 1
                                             if self.i % 10000 == 0:
@@ -548,13 +685,19 @@ class GamePlayer(object):
                             seats[uuid]['state'] = 'folded'
 
                         if a['action'] not in ['BIGBLIND', 'SMALLBLIND']:
+                            action = {
+                                'player_uuid': a['uuid'],
+                                'action': a['action'].lower(),
+                                'amount': 0 if a['action'] == 'FOLD' else a['amount']
+                            }
                             for uuid in features:
-                                action = {
-                                    'player_uuid': a['uuid'],
-                                    'action': a['action'].lower(),
-                                    'amount': 0 if a['action'] == 'FOLD' else a['amount']
-                                }
                                 on_player_action(features[uuid], uuid, action)
 
+                            if self.profiles is not None:
+                                self.profiles.on_player_action(action)
+
             for uuid in features:
                 on_round_result(features[uuid], uuid, r['winners'], r['hand_info'])
+
+            if self.profiles is not None:
+                self.profiles.on_round_result()
@@ -0,0 +1,90 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+
+
+class Instruments(object):
+    def __init__(self, output=None, interval=60):
+        self.output = output
+        self.interval = interval
+        self.timers = {}
+        self.counters = {}
+        self.started = time.time()
+        self.last_dump = self.started
+
+    @property
+    def enabled(self):
+        return self.output is not None
+
+    def add_time(self, name, elapsed):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0]
+
+        timer[0] += 1
+        timer[1] += elapsed
+        timer[2] = max(timer[2], elapsed)
+
+        if self.interval > 0 and time.time() - self.last_dump > self.interval:
+            self.dump()
+
+    def count(self, name, n=1):
+        if self.output is not None:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name):
+        def decorator(func):
+            if self.output is None:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add_time(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def report(self):
+        timers = {}
+        for name, (num, total, max_time) in sorted(self.timers.items()):
+            timers[name] = {
+                'count': num,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': round(total * 1000 / num, 3),
+                'max_ms': round(max_time * 1000, 3)
+            }
+
+        return {
+            'time': round(time.time(), 3),
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started, 3),
+            'timers': timers,
+            'counters': dict(sorted(self.counters.items()))
+        }
+
+    def dump(self):
+        self.last_dump = time.time()
+        line = json.dumps(self.report()) + '\n'
+
+        if self.output == 'stderr':
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(self.output, 'a') as f:
+                f.write(line)
+
+
+instruments = Instruments(os.environ.get('HOLDEM_PROFILE'), float(os.environ.get('HOLDEM_PROFILE_INTERVAL', 60)))
+if instruments.enabled:
+    atexit.register(instruments.dump)
+
+timed = instruments.timed
+count = instruments.count
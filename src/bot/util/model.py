@@ -1,7 +1,8 @@
-import pandas as pd
-from catboost import CatBoostClassifier
+import numpy as np
+from catboost import CatBoostClassifier, CatBoostRegressor
 from pypokerengine.engine.deck import Deck
 from pypokerengine.engine.round_manager import RoundManager
+from .instrument import timed
 
 
 class ModelPool(object):
@@ -13,6 +14,7 @@ class ModelPool(object):
             self.models.append(model)
 
     def predict(self, X):
+        import pandas as pd
         predicts = {}
         for i, model in enumerate(self.models):
             predicts['model_' + str(i)] = model.predict(X)
@@ -29,7 +31,9 @@ class MergeModel(object):
         self.model = classifier()
         self.model.load_model(dir + '/' + name + '.model')
 
+    @timed('model.merge_predict')
     def predict(self, X, model_num=None):
+        import pandas as pd
         if model_num is not None:
             return pd.DataFrame(self.predictModel(X, model_num), index=X.index)
 
@@ -40,6 +44,37 @@ class MergeModel(object):
         return self.model_pool.predictModel(X, num)
 
 
+class FusedModel(object):
+    names = ['call', 'raise', 'raise_amount']
+
+    def __init__(self, num, dir, classifiers=(CatBoostClassifier, CatBoostClassifier, CatBoostRegressor)):
+        self.pools = []
+        self.models = []
+
+        for name, classifier in zip(FusedModel.names, classifiers):
+            self.pools.append(ModelPool(num, dir + '/pool/' + name + '/', classifier=classifier).models)
+            model = classifier()
+            model.load_model(dir + '/' + name + '.model')
+            self.models.append(model)
+
+    @timed('model.predict')
+    def predict_batch(self, X, model_num=None):
+        X = np.asarray(X, dtype=np.float32)
+        predicts = np.empty((len(X), len(self.models)))
+
+        for i, (pool, model) in enumerate(zip(self.pools, self.models)):
+            if model_num is not None:
+                predicts[:, i] = pool[model_num].predict(X)
+            else:
+                X_pool = np.column_stack([m.predict(X) for m in pool])
+                predicts[:, i] = model.predict(X_pool)
+
+        return predicts
+
+    def predict(self, x, model_num=None):
+        return self.predict_batch(np.reshape(x, (1, -1)), model_num)[0].tolist()
+
+
 class PokerSim(object):
     def __init__(self, num_players, num_rounds):
         self.round_count = 0
@@ -54,7 +89,14 @@ class PokerSim(object):
 
             self.cards.append(cards)
 
+    def install(self):
+        RoundManager._RoundManager__deal_holecard = staticmethod(lambda deck, players: self.deal_holecard(players))
+        RoundManager._RoundManager__flop = staticmethod(lambda state: self.deal_community_card(state, 3))
+        RoundManager._RoundManager__turn = staticmethod(lambda state: self.deal_community_card(state, 1))
+        RoundManager._RoundManager__river = staticmethod(lambda state: self.deal_community_card(state, 1))
+
     def deal_holecard(self, players):
+        self.round_count += 1
         self.community_from = 0
 
         for i, player in enumerate(players):
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+STREETS = ['preflop', 'flop', 'turn', 'river']
+PROFILE_COLUMNS = ['profile_rounds', 'profile_vpip', 'profile_pfr'] + ['profile_af_' + s for s in STREETS]
+
+VPIP = 0
+PFR = 1
+RAISES = 2
+CALLS = 3
+
+
+class OpponentProfiles(object):
+    def __init__(self, window=200, capacity=16):
+        self.window = window
+        self.names = {}
+        self.rows = {}
+        self.street = 0
+        self.records = np.zeros((capacity, window, 2 + 2 * len(STREETS)), dtype=np.int16)
+        self.sums = np.zeros((capacity, self.records.shape[2]), dtype=np.int32)
+        self.current = np.zeros((capacity, self.records.shape[2]), dtype=np.int16)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.filled = np.zeros(capacity, dtype=np.int32)
+        self.pos = np.zeros(capacity, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def reg_name(self, name):
+        if name not in self.names:
+            if len(self.names) == len(self.sums):
+                self.grow()
+            self.names[name] = len(self.names)
+
+        return self.names[name]
+
+    def grow(self):
+        for attr in ['records', 'sums', 'current', 'active', 'filled', 'pos']:
+            values = getattr(self, attr)
+            setattr(self, attr, np.concatenate([values, np.zeros_like(values)]))
+
+    def on_game_start(self, game_info):
+        self.rows = {}
+        for seat in game_info['seats']:
+            self.rows[seat['uuid']] = self.reg_name(seat['name'])
+
+    def on_round_start(self, seats):
+        self.current[:] = 0
+        self.active[:] = False
+        for seat in seats:
+            if seat['uuid'] in self.rows:
+                self.active[self.rows[seat['uuid']]] = seat['state'] == 'participating'
+
+    def on_street_start(self, street):
+        self.street = STREETS.index(street)
+
+    def on_player_action(self, action):
+        row = self.rows.get(action['player_uuid'])
+        if row is None:
+            return
+
+        current = self.current[row]
+        if action['action'] == 'raise':
+            current[RAISES + 2 * self.street] += 1
+            if self.street == 0:
+                current[VPIP] = 1
+                current[PFR] = 1
+        elif action['action'] == 'call':
+            current[CALLS + 2 * self.street] += 1
+            if self.street == 0:
+                current[VPIP] = 1
+
+    def on_round_result(self):
+        for row in np.nonzero(self.active)[0]:
+            slot = self.pos[row]
+            self.sums[row] += self.current[row] - self.records[row, slot]
+            self.records[row, slot] = self.current[row]
+            self.pos[row] = (slot + 1) % self.window
+            self.filled[row] = min(self.filled[row] + 1, self.window)
+
+    def get_features(self, uuid):
+        row = self.rows.get(uuid)
+        if row is None or self.filled[row] == 0:
+            return [0] * len(PROFILE_COLUMNS)
+
+        rounds = int(self.filled[row])
+        sums = self.sums[row].tolist()
+        f = [rounds, round(sums[VPIP] / rounds, 2), round(sums[PFR] / rounds, 2)]
+        for s in range(len(STREETS)):
+            f.append(round(sums[RAISES + 2 * s] / max(sums[CALLS + 2 * s], 1), 2))
+
+        return f
+
+    def save(self, path):
+        n = len(self.names)
+        np.savez(path, names=np.array(sorted(self.names, key=self.names.get)), records=self.records[:n],
+                 sums=self.sums[:n], filled=self.filled[:n], pos=self.pos[:n])
+
+    @staticmethod
+    def load(path):
+        data = np.load(path)
+        profiles = OpponentProfiles(window=data['records'].shape[1], capacity=max(16, len(data['names'])))
+        for name in data['names'].tolist():
+            profiles.reg_name(name)
+
+        n = len(data['names'])
+        profiles.records[:n] = data['records']
+        profiles.sums[:n] = data['sums']
+        profiles.filled[:n] = data['filled']
+        profiles.pos[:n] = data['pos']
+
+        return profiles
@@ -0,0 +1,333 @@
+from . import features
+from .features import get_card_equity, get_card_features, get_card_preflop_odds, get_live_opponents
+from .instrument import timed
+from .profiles import PROFILE_COLUMNS
+import time
+import numpy as np
+
+
+MAX_PLAYERS = 6
+STRENGTH = ["HIGHCARD", "ONEPAIR", "TWOPAIR", "THREECARD", "STRAIGHT", "FLASH", "FULLHOUSE", "FOURCARD", "STRAIGHTFLASH"]
+STREETS = ['preflop', 'flop', 'turn', 'river']
+ACTIONS = ['fold', 'call', 'raise']
+
+CARD_COLUMNS = [
+    'card_hand_high', 'card_hand_strength', 'card_hand_community_high', 'card_hand_community_strength',
+    'card_hole_max_rank', 'card_hole_num2', 'card_hole_num2_max_rank',
+    'card_hole_suit2', 'card_hole_suit4', 'card_hole_suit8', 'card_hole_suit16',
+    'card_community_max_rank', 'card_community_num4', 'card_community_num4_max_rank',
+    'card_community_num3', 'card_community_num3_max_rank', 'card_community_num2', 'card_community_num2_max_rank',
+    'card_community_suit2', 'card_community_suit4', 'card_community_suit8', 'card_community_suit16',
+    'card_sim3_proba'
+]
+
+GAME_COLUMNS = ['round_count'] + CARD_COLUMNS + [s + '_card_sim3_proba' for s in STREETS[1:]] + [
+    'street', 'preflop_odds', 'pot', 'call_amount', 'raise_amount_min', 'raise_amount_max',
+    'players_in_game', 'players_in_round'
+]
+
+EQUITY_COLUMNS = ['card_equity', 'card_equity_live']
+
+PLAYER_COLUMNS = [
+    'dealer', 'small_blind', 'big_blind', 'win_rounds', 'lose_rounds', 'win_rounds_nohand', 'stack',
+    'hand_paid', 'hand_strength', 'hand_hole_pairs', 'hand_hole_high'
+]
+for action in ACTIONS:
+    PLAYER_COLUMNS += [action + '_rounds', action + '_in_round', action + '_in_street']
+    for street in STREETS:
+        PLAYER_COLUMNS += [action + '_in_' + street, action + '_' + street + 's']
+PLAYER_COLUMNS += [s + '_rounds' for s in STREETS[1:]]
+PLAYER_COLUMNS += ['paid', 'stack_rel_top_player', 'stack_rel_game_start', 'stack_rel_total']
+
+
+def get_player_columns(profile_columns=()):
+    return PLAYER_COLUMNS[:-4] + list(profile_columns) + PLAYER_COLUMNS[-4:]
+
+
+def get_columns(profile_columns=(), equity_columns=()):
+    player_columns = get_player_columns(profile_columns)
+    return GAME_COLUMNS + list(equity_columns) + \
+        ['player_' + str(i) + '_' + c for i in range(MAX_PLAYERS) for c in player_columns]
+
+
+COLUMNS = get_columns()
+
+
+class PlayerState(object):
+    __slots__ = [
+        'me', 'num', 'dealer', 'small_blind', 'big_blind', 'win_rounds', 'lose_rounds', 'win_rounds_nohand',
+        'stack', 'start_stack', 'hand_paid', 'hand_strength', 'hand_hole_pairs', 'hand_hole_high', 'state',
+        'rounds', 'in_round', 'in_street', 'in_streets', 'streets', 'actions', 'street_rounds'
+    ]
+
+    def __init__(self, num, me=False):
+        self.me = me
+        self.num = num
+        self.dealer = 0
+        self.small_blind = 0
+        self.big_blind = 0
+        self.win_rounds = 0
+        self.lose_rounds = 0
+        self.win_rounds_nohand = 0
+        self.stack = 0
+        self.start_stack = 0
+        self.hand_paid = 0
+        self.hand_strength = 0
+        self.hand_hole_pairs = 0
+        self.hand_hole_high = 0
+        self.state = None
+        self.rounds = [0] * len(ACTIONS)
+        self.in_round = [0] * len(ACTIONS)
+        self.in_street = [0] * len(ACTIONS)
+        self.in_streets = [[0] * len(STREETS) for _ in ACTIONS]
+        self.streets = [[0] * len(STREETS) for _ in ACTIONS]
+        self.actions = [0] * len(STREETS)
+        self.street_rounds = [0] * len(STREETS)
+
+    def fill(self, v, i, round_count, sb, max_stack, initial_stack, total_stack, profile=()):
+        v[i:i + 11] = [
+            self.dealer, self.small_blind, self.big_blind,
+            round(self.win_rounds / round_count, 1),
+            round(self.lose_rounds / round_count, 1),
+            round(self.win_rounds_nohand / (self.win_rounds + 1), 1),
+            int(round(self.stack / sb)),
+            int(round(self.hand_paid / sb)),
+            self.hand_strength, self.hand_hole_pairs, self.hand_hole_high
+        ]
+        i += 11
+
+        for a in range(len(ACTIONS)):
+            v[i:i + 3] = [round(self.rounds[a] / round_count, 1), self.in_round[a], self.in_street[a]]
+            i += 3
+            for s in range(len(STREETS)):
+                v[i] = self.in_streets[a][s]
+                v[i + 1] = round(self.streets[a][s] / (self.actions[s] + 1), 1)
+                i += 2
+
+        for s in range(1, len(STREETS)):
+            v[i] = round(self.street_rounds[s] / round_count, 1)
+            i += 1
+
+        v[i:i + len(profile)] = profile
+        i += len(profile)
+
+        v[i:i + 4] = [
+            int(round((self.start_stack - self.stack) / sb)),
+            round(self.stack / max_stack, 1),
+            round(self.stack / initial_stack, 1),
+            round(self.stack / total_stack, 1)
+        ]
+
+
+class FeatureState(object):
+    __slots__ = [
+        'small_blind_amount', 'initial_stack', 'total_stack', 'players', 'player_num', 'round_count',
+        'hole_card', 'community_card', 'card_values', 'street_sim3_proba', 'street', 'pot', 'call_amount',
+        'raise_amount_min', 'raise_amount_max', 'profiles', 'sim3_budget', 'sim3_pending', 'equity', 'columns',
+        'vector'
+    ]
+
+    def __init__(self, profiles=None, sim3_budget=None, equity=False):
+        self.players = {}
+        self.player_num = 0
+        self.round_count = 0
+        self.hole_card = []
+        self.community_card = []
+        self.card_values = [0] * len(CARD_COLUMNS)
+        self.street_sim3_proba = [0] * len(STREETS)
+        self.street = 0
+        self.pot = 0
+        self.call_amount = 0
+        self.raise_amount_min = 0
+        self.raise_amount_max = 0
+        self.profiles = profiles
+        self.sim3_budget = sim3_budget
+        self.sim3_pending = False
+        self.equity = [0, 0] if equity else None
+        self.columns = get_columns(() if profiles is None else PROFILE_COLUMNS, EQUITY_COLUMNS if equity else ())
+        self.vector = np.zeros(len(self.columns))
+
+    def on_cards_change(self):
+        f = get_card_features(self.hole_card, self.community_card, sim3=self.sim3_budget is None)
+        self.sim3_pending = self.sim3_budget is not None and len(self.community_card) > 0
+        f['hand_strength'] = STRENGTH.index(f['hand_strength'])
+        f['hand_community_strength'] = STRENGTH.index(f['hand_community_strength'])
+        self.card_values = [f[c[5:]] for c in CARD_COLUMNS]
+
+    @timed('state.on_game_start')
+    def on_game_start(self, player_uuid, game_info):
+        self.small_blind_amount = game_info['rule']['small_blind_amount']
+        self.initial_stack = game_info['rule']['initial_stack']
+        self.total_stack = self.initial_stack * len(game_info['seats'])
+        self.players = {}
+
+        for i, seat in enumerate(game_info['seats']):
+            self.players[seat['uuid']] = PlayerState(i, seat['uuid'] == player_uuid)
+            if seat['uuid'] == player_uuid:
+                self.player_num = i
+
+        if self.profiles is not None:
+            self.profiles.on_game_start(game_info)
+
+    @timed('state.on_round_start')
+    def on_round_start(self, player_uuid, round_count, hole_card, seats):
+        self.round_count = round_count
+        self.hole_card = hole_card
+        self.community_card = []
+        self.on_cards_change()
+        self.street_sim3_proba = [0] * len(STREETS)
+
+        for seat in seats:
+            player = self.players[seat['uuid']]
+            player.start_stack = seat['stack']
+            player.state = seat['state']
+            player.in_round = [0] * len(ACTIONS)
+            player.in_street = [0] * len(ACTIONS)
+            player.in_streets = [[0] * len(STREETS) for _ in ACTIONS]
+
+        if self.profiles is not None:
+            self.profiles.on_round_start(seats)
+
+    @timed('state.on_street_start')
+    def on_street_start(self, player_uuid, street, round_state):
+        self.street = STREETS.index(street)
+
+        if self.street == 0:
+            for player in self.players.values():
+                player.dealer = 1 if player.num == round_state['dealer_btn'] else 0
+                player.small_blind = 1 if player.num == round_state['small_blind_pos'] else 0
+                player.big_blind = 1 if player.num == round_state['big_blind_pos'] else 0
+        else:
+            self.community_card = round_state['community_card'][:self.street + 2]
+            self.on_cards_change()
+            self.street_sim3_proba[self.street] = self.card_values[-1]
+            for player in self.players.values():
+                if player.state != 'folded':
+                    player.street_rounds[self.street] += 1
+
+                player.in_street = [0] * len(ACTIONS)
+
+        if self.equity is not None:
+            n_opponents = get_live_opponents(round_state, player_uuid)
+            self.equity = get_card_equity(self.hole_card, self.community_card, n_opponents)
+
+        if self.profiles is not None:
+            self.profiles.on_street_start(street)
+
+    @timed('state.on_player_action')
+    def on_player_action(self, player_uuid, action):
+        player = self.players[action['player_uuid']]
+        a = ACTIONS.index(action['action'])
+        s = self.street
+
+        player.actions[s] += 1
+        player.in_round[a] += 1
+        player.in_street[a] += 1
+        player.in_streets[a][s] += 1
+
+        if player.in_round[a] == 1:
+            player.rounds[a] += 1
+
+        if player.in_streets[a][s] == 1:
+            player.streets[a][s] += 1
+
+        if self.profiles is not None:
+            self.profiles.on_player_action(action)
+
+    @timed('state.on_declare_action')
+    def on_declare_action(self, player_uuid, valid_actions, round_state):
+        if self.sim3_pending:
+            deadline = time.perf_counter() + self.sim3_budget
+            proba = features.get_sim3_proba(self.hole_card, self.community_card, deadline)
+            if proba is None:
+                proba = features.get_card_preflop_odds(self.hole_card, 3) / 100
+            else:
+                self.sim3_pending = False
+
+            self.card_values[-1] = proba
+            self.street_sim3_proba[self.street] = proba
+
+        self.pot = round_state['pot']['main']['amount']
+        self.call_amount = valid_actions[1]['amount']
+        self.raise_amount_min = valid_actions[2]['amount']['min']
+        self.raise_amount_max = valid_actions[2]['amount']['max']
+
+        for seat in round_state['seats']:
+            player = self.players[seat['uuid']]
+            player.stack = seat['stack']
+            player.state = seat['state']
+
+    @timed('state.on_round_result')
+    def on_round_result(self, player_uuid, winners, hand_info):
+        winner_uuids = []
+
+        for winner in winners:
+            winner_uuids.append(winner['uuid'])
+            player = self.players[winner['uuid']]
+            player.win_rounds += 1
+            player.win_rounds_nohand += min(len(hand_info), 1)
+
+        for h in hand_info:
+            if h['uuid'] not in winner_uuids:
+                player = self.players[h['uuid']]
+                player.lose_rounds += 1
+
+                player.hand_paid = player.start_stack - player.stack
+                player.hand_strength = STRENGTH.index(h['hand']['hand']['strength'])
+                player.hand_hole_high = h['hand']['hole']['high']
+                if h['hand']['hole']['high'] == h['hand']['hole']['low']:
+                    player.hand_hole_pairs = h['hand']['hole']['high']
+                else:
+                    player.hand_hole_pairs = 0
+
+        if self.profiles is not None:
+            self.profiles.on_round_result()
+
+    @timed('state.get_vector')
+    def get_vector(self):
+        v = self.vector
+        sb = self.small_blind_amount
+        players = list(self.players.items())
+        game_size = len(GAME_COLUMNS) if self.equity is None else len(GAME_COLUMNS) + len(self.equity)
+        player_size = (len(self.columns) - game_size) // MAX_PLAYERS
+
+        players_in_game = 0
+        players_in_round = 0
+        max_stack = 0
+        for _, player in players:
+            if player.start_stack > 0:
+                players_in_game += 1
+            if player.state == 'participating':
+                players_in_round += 1
+            max_stack = max(max_stack, player.stack)
+
+        v[0] = self.round_count
+        v[1:len(CARD_COLUMNS) + 1] = self.card_values
+        i = len(CARD_COLUMNS) + 1
+        v[i:len(GAME_COLUMNS)] = self.street_sim3_proba[1:] + [
+            self.street,
+            round(get_card_preflop_odds(self.hole_card, players_in_game), 1),
+            int(round(self.pot / sb)),
+            int(round(self.call_amount / sb)),
+            int(round(self.raise_amount_min / sb)),
+            int(round(self.raise_amount_max / sb)),
+            players_in_game,
+            players_in_round
+        ]
+
+        if self.equity is not None:
+            v[len(GAME_COLUMNS):game_size] = self.equity
+
+        players.sort(key=lambda x: (-x[1].me, -(x[1].state == 'participating'), -(x[1].num < self.player_num), -x[1].num))
+        i = game_size
+        for uuid, player in players[:MAX_PLAYERS]:
+            if player.state == 'participating':
+                profile = () if self.profiles is None else self.profiles.get_features(uuid)
+                player.fill(v, i, self.round_count, sb, max_stack, self.initial_stack, self.total_stack, profile)
+            else:
+                v[i:i + player_size] = -1
+            i += player_size
+
+        v[i:] = -1
+
+        return v
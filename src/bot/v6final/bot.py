@@ -1,9 +1,10 @@
-import copy
-import pandas as pd
+import numpy as np
 from pypokerengine.players import BasePokerPlayer
-from bot.util.features import *
-from bot.util.model import MergeModel
-from catboost import CatBoostClassifier, CatBoostRegressor
+from bot.util.equity import calibrate_win_rate
+from bot.util.features import get_card_features
+from bot.util.instrument import timed
+from bot.util.state import COLUMNS, FeatureState
+from bot.util.model import FusedModel
 import pickle
 
 
@@ -11,23 +12,30 @@ class ManulPlayer6Final(BasePokerPlayer):
     model_dir = 'model/final'
     names = ['KillFish', 'dannyace', 'fcll']
 
-    model_call = MergeModel(len(names), model_dir, 'call')
-    model_raise = MergeModel(len(names), model_dir, 'raise')
-    model_raise_amount = MergeModel(len(names), model_dir, 'raise_amount', classifier=CatBoostRegressor)
+    model = FusedModel(len(names), model_dir)
+    sim3_budget = 0.05
 
     def __init__(self, model_num=None):
         super().__init__()
         self.names = ManulPlayer6Final.names
-        self.model_call = ManulPlayer6Final.model_call
-        self.model_raise = ManulPlayer6Final.model_raise
-        self.model_raise_amount = ManulPlayer6Final.model_raise_amount
+        self.model = ManulPlayer6Final.model
         self.model_num = model_num
 
+    def warm_up(self):
+        get_card_features(['SA', 'SK'], ['S2', 'S3', 'H9'])
+        calibrate_win_rate()
+        self.model.predict(np.zeros(len(COLUMNS)), self.model_num)
+
     def predict_action(self, X, valid_actions):
-        if self.model_call.predict(X, self.model_num)[0][0] > 0:
-            if self.model_raise.predict(X, self.model_num)[0][0] > 0:
+        return self.choose_action(self.model.predict(X, self.model_num), valid_actions)
+
+    def choose_action(self, predicts, valid_actions):
+        call, raise_, raise_amount = predicts
+
+        if call > 0:
+            if raise_ > 0:
                 if (len(valid_actions) > 2) and valid_actions[2]['amount']['min'] != -1:
-                    amount = self.sb * int(round(self.model_raise_amount.predict(X, self.model_num)[0][0]))
+                    amount = self.sb * int(round(raise_amount))
                     amount = max(valid_actions[2]['amount']['min'], amount)
                     amount = min(valid_actions[2]['amount']['max'], amount)
                     return valid_actions[2]['action'], amount
@@ -38,18 +46,30 @@ class ManulPlayer6Final(BasePokerPlayer):
         else:
             return valid_actions[0]['action'], valid_actions[0]['amount']
 
-    def declare_action(self, valid_actions, hole_card, round_state, bot_state=None):
-        on_declare_action(self.features, self.uuid, valid_actions, round_state)
+    def predict_actions(self, X):
+        call, raise_, raise_amount = self.model.predict_batch(X[COLUMNS], self.model_num).T
+        raise_min = X['raise_amount_min'].values
+        raise_max = X['raise_amount_max'].values
 
-        features = copy.deepcopy(self.features)
-        X, _ = clean_features([features])
-        X = pd.DataFrame(X)
+        action = np.where(call > 0, np.where((raise_ > 0) & (raise_min > 0), 'raise', 'call'), 'fold')
+        action = np.where((action == 'fold') & (X['call_amount'].values == 0), 'call', action)
+        amount = np.where(action == 'raise', np.clip(np.round(raise_amount), raise_min, raise_max), 0)
+
+        return action, amount
+
+    @timed('bot.declare_action')
+    def declare_action(self, valid_actions, hole_card, round_state, bot_state=None):
+        X = self.get_vector(valid_actions, round_state)
 
         action, amount = self.predict_action(X, valid_actions)
         # print(action, amount)
 
         return self.sanity_check(action, amount, valid_actions)
 
+    def get_vector(self, valid_actions, round_state):
+        self.state.on_declare_action(self.uuid, valid_actions, round_state)
+        return self.state.get_vector()
+
     def sanity_check(self, action, amount, valid_actions):
         if valid_actions[1]['amount'] == 0:
             if action == 'fold':
@@ -58,18 +78,18 @@ class ManulPlayer6Final(BasePokerPlayer):
         return action, amount
 
     def receive_game_start_message(self, game_info):
-        self.features = {}
+        self.state = FeatureState(sim3_budget=self.sim3_budget)
         self.sb = game_info['rule']['small_blind_amount']
-        on_game_start(self.features, self.uuid, game_info)
+        self.state.on_game_start(self.uuid, game_info)
 
     def receive_round_start_message(self, round_count, hole_card, seats):
-        on_round_start(self.features, self.uuid, round_count, hole_card, seats)
+        self.state.on_round_start(self.uuid, round_count, hole_card, seats)
 
     def receive_street_start_message(self, street, round_state):
-        on_street_start(self.features, self.uuid, street, round_state)
+        self.state.on_street_start(self.uuid, street, round_state)
 
     def receive_game_update_message(self, action, round_state):
-        on_player_action(self.features, self.uuid, action)
+        self.state.on_player_action(self.uuid, action)
 
     def receive_round_result_message(self, winners, hand_info, round_state):
-        on_round_result(self.features, self.uuid, winners, hand_info)
+        self.state.on_round_result(self.uuid, winners, hand_info)
@@ -0,0 +1,54 @@
+import argparse
+import os
+import pandas as pd
+from bot.util.data import get_games
+from bot.util.dataset import load_Xy
+from bot.util.features import GamePlayer
+from bot.v6final.bot import ManulPlayer6Final
+
+
+def evaluate(player, X, y):
+    predicted, _ = player.predict_actions(X)
+    result = pd.DataFrame({
+        'name': y['private_bot_name'].values,
+        'action': y['private_bot_action'].str.lower().values,
+        'predicted': predicted
+    })
+    result['agree'] = result['action'] == result['predicted']
+
+    report = result.groupby('name')['agree'].agg(['count', 'mean'])
+    for action in ['fold', 'call', 'raise']:
+        report[action] = result[result['predicted'] == action].groupby('name').size()
+        report[action] = report[action].fillna(0).astype(int) / report['count']
+    report.loc['total'] = [len(result), result['agree'].mean()] + \
+        [(result['predicted'] == action).mean() for action in ['fold', 'call', 'raise']]
+
+    return report
+
+
+def load_features(path, player_names=None, num_games=None):
+    if os.path.isdir(path + 'X'):
+        return load_Xy(path)
+
+    player = GamePlayer()
+    if player_names is not None:
+        player.filter_seats(lambda x: x['private_bot_name'] in player_names)
+
+    for i, game in enumerate(get_games(path, player_names=player_names)):
+        if num_games is not None and i >= num_games:
+            break
+        player.play_game(game)
+
+    return player.get_features(save_cache=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='extracted features dir (with X/ and y/) or tournament dir')
+    parser.add_argument('--player-names', nargs='+', default=None)
+    parser.add_argument('--games', type=int, default=None)
+    parser.add_argument('--model-num', type=int, default=None)
+    args = parser.parse_args()
+
+    X, y = load_features(args.path.rstrip('/') + '/', args.player_names, args.games)
+    print(evaluate(ManulPlayer6Final(args.model_num), X, y).round(3))
@@ -1,33 +1,104 @@
+import argparse
 import sys
 import json
-from bot.v6final.bot import ManulPlayer6Final
+import socket
+
+
+decoder = json.JSONDecoder()
+
+
+def get_field(data, name, kind):
+    i = data.find('"' + name + '":')
+    if i == -1:
+        return json.loads(data)[name]
+
+    prefix = ''.join(data[:i].replace('\\\\', '').replace('\\"', '').split('"')[::2])
+    if prefix.count('{') - prefix.count('}') != 1 or prefix.count('[') != prefix.count(']'):
+        return json.loads(data)[name]
+
+    i += len(name) + 3
+    while data[i] in ' \t\r\n':
+        i += 1
+
+    value = decoder.raw_decode(data, i)[0]
+    if not isinstance(value, kind):
+        return json.loads(data)[name]
+
+    return value
+
+
+def handle_event(player, event_type, data):
+    if event_type == 'declare_action':
+        data = json.loads(data)
+        action, amount = player.declare_action(
+            data['valid_actions'], data['hole_card'], data['round_state'], data.get('bot_state'))
+        return '{}\t{}\n'.format(action, amount)
+    elif event_type == 'game_start':
+        data = json.loads(data)
+        player.set_uuid(data.get('uuid'))
+        player.receive_game_start_message(data)
+    elif event_type == 'round_start':
+        data = json.loads(data)
+        player.receive_round_start_message(data['round_count'], data['hole_card'], data['seats'])
+    elif event_type == 'street_start':
+        data = json.loads(data)
+        player.receive_street_start_message(data['street'], data['round_state'])
+    elif event_type == 'game_update':
+        player.receive_game_update_message(get_field(data, 'new_action', dict), None)
+    elif event_type == 'round_result':
+        player.receive_round_result_message(get_field(data, 'winners', list), get_field(data, 'hand_info', list), None)
+    else:
+        raise RuntimeError('Bad event type "{}"'.format(event_type))
+
+
+def connect(address):
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        return socket.create_connection((host, int(port)))
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+def relay(address, stdin, stdout):
+    server = connect(address).makefile('rwb')
+
+    for line in stdin:
+        if not line.strip():
+            break
+
+        server.write(line)
+        server.flush()
+        if line.startswith(b'declare_action\t'):
+            stdout.write(server.readline())
+            stdout.flush()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connect', default=None, help='relay to a bot server (unix socket path or host:port)')
+    args = parser.parse_args()
+
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+
+    if args.connect is not None:
+        relay(args.connect, stdin, stdout)
+        sys.exit(0)
+
+    from bot.v6final.bot import ManulPlayer6Final
+
     player = ManulPlayer6Final()
+    player.warm_up()
 
-    while True:
-        line = sys.stdin.readline().rstrip()
+    for line in stdin:
+        line = line.decode('utf-8').rstrip()
         if not line:
-           break
+            break
         event_type, data = line.split('\t', 1)
-        data = json.loads(data)
 
-        if event_type == 'declare_action':
-            action, amount = player.declare_action(
-                data['valid_actions'], data['hole_card'], data['round_state'], data.get('bot_state'))
-            sys.stdout.write('{}\t{}\n'.format(action, amount))
-            sys.stdout.flush()
-        elif event_type == 'game_start':
-            player.set_uuid(data.get('uuid'))
-            player.receive_game_start_message(data)
-        elif event_type == 'round_start':
-            player.receive_round_start_message(data['round_count'], data['hole_card'], data['seats'])
-        elif event_type == 'street_start':
-            player.receive_street_start_message(data['street'], data['round_state'])
-        elif event_type == 'game_update':
-            player.receive_game_update_message(data['new_action'], data['round_state'])
-        elif event_type == 'round_result':
-            player.receive_round_result_message(data['winners'], data['hand_info'], data['round_state'])
-        else:
-            raise RuntimeError('Bad event type "{}"'.format(event_type))
\ No newline at end of file
+        response = handle_event(player, event_type, data)
+        if response is not None:
+            stdout.write(response.encode('utf-8'))
+            stdout.flush()
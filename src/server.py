@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from bot.util.instrument import count
+from bot.v6final.bot import ManulPlayer6Final
+from main import handle_event
+
+
+SIM3_BUDGET = 0.005
+
+
+class Batcher(object):
+    def __init__(self, model, model_num=None, max_batch=64, max_delay=0.001, loop=None):
+        self.model = model
+        self.model_num = model_num
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.executor = ThreadPoolExecutor(1)
+        self.queue = []
+        self.timer = None
+
+    def predict(self, x):
+        future = self.loop.create_future()
+        self.queue.append((x, future))
+
+        if len(self.queue) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(self.max_delay, self.flush)
+
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch, self.queue = self.queue, []
+        if len(batch) == 0:
+            return
+
+        count('server.batches')
+        count('server.batch_rows', len(batch))
+        X = np.stack([x for x, _ in batch])
+        done = self.loop.run_in_executor(self.executor, self.model.predict_batch, X, self.model_num)
+        done.add_done_callback(lambda result: self.resolve(batch, result))
+
+    @staticmethod
+    def resolve(batch, result):
+        if result.exception() is not None:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(result.exception())
+            return
+
+        for (_, future), predicts in zip(batch, result.result().tolist()):
+            if not future.done():
+                future.set_result(predicts)
+
+
+class Session(object):
+    def __init__(self, batcher, model_num=None, sim3_budget=SIM3_BUDGET):
+        self.batcher = batcher
+        self.player = ManulPlayer6Final(model_num)
+        self.player.sim3_budget = sim3_budget
+
+    async def declare_action(self, data):
+        data = json.loads(data)
+        valid_actions = data['valid_actions']
+        X = self.player.get_vector(valid_actions, data['round_state']).copy()
+
+        predicts = await self.batcher.predict(X)
+        action, amount = self.player.choose_action(predicts, valid_actions)
+        action, amount = self.player.sanity_check(action, amount, valid_actions)
+
+        return '{}\t{}\n'.format(action, amount)
+
+    async def serve(self, reader, writer):
+        count('server.sessions')
+
+        try:
+            while True:
+                line = await reader.readline()
+                line = line.decode('utf-8').rstrip()
+                if not line:
+                    break
+                event_type, data = line.split('\t', 1)
+
+                if event_type == 'declare_action':
+                    writer.write((await self.declare_action(data)).encode('utf-8'))
+                else:
+                    handle_event(self.player, event_type, data)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            writer.close()
+
+
+def start_server(address, batcher, model_num=None, sim3_budget=SIM3_BUDGET):
+    def on_connect(reader, writer):
+        return Session(batcher, model_num, sim3_budget).serve(reader, writer)
+
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        return asyncio.start_server(on_connect, host, int(port), limit=1 << 24)
+
+    if os.path.exists(address):
+        os.unlink(address)
+
+    return asyncio.start_unix_server(on_connect, address, limit=1 << 24)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('address', nargs='?', default='/tmp/holdem.sock', help='unix socket path or host:port')
+    parser.add_argument('--model-num', type=int, default=None)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-delay', type=float, default=0.001, help='seconds to wait for more tables')
+    parser.add_argument('--sim3-budget', type=float, default=SIM3_BUDGET,
+                        help='per-decision sim3 budget, seconds; it runs on the event loop and delays every table')
+    args = parser.parse_args()
+
+    ManulPlayer6Final(args.model_num).warm_up()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    batcher = Batcher(ManulPlayer6Final.model, args.model_num, args.max_batch, args.max_delay, loop)
+    server = loop.run_until_complete(start_server(args.address, batcher, args.model_num, args.sim3_budget))
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    sys.stderr.write('Serving on {}\n'.format(args.address))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        if ':' not in args.address and os.path.exists(args.address):
+            os.unlink(args.address)
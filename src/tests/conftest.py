@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAMES_DIR = os.path.join(os.path.dirname(SRC_DIR), 'poker-vis', 'games', 'final') + '/'
+sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture
+def games():
+    from bot.util.data import get_games, list_games
+
+    return list(get_games(GAMES_DIR, game_ids=list_games(GAMES_DIR)[:2]))
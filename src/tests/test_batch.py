@@ -0,0 +1,42 @@
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+from bot.util import features
+from bot.util.profiles import PROFILE_COLUMNS, OpponentProfiles
+from bot.util.state import EQUITY_COLUMNS, get_columns
+
+
+@pytest.mark.parametrize('profiles, equity', [(False, False), (True, False), (False, True)])
+def test_feature_batch_matches_clean_features(games, monkeypatch, profiles, equity):
+    raw = []
+    add_features = features.GamePlayer.add_features
+
+    def record(self, f):
+        f_copy = copy.deepcopy(f)
+        if self.profiles is not None:
+            for uuid, player in f_copy['players'].items():
+                player.update(zip(PROFILE_COLUMNS, self.profiles.get_features(uuid)))
+        raw.append(f_copy)
+        add_features(self, f)
+
+    monkeypatch.setattr(features.GamePlayer, 'add_features', record)
+
+    player = features.GamePlayer(profiles=OpponentProfiles(window=20) if profiles else None, equity=equity)
+    for game in games:
+        player.play_game(game)
+    X, y = player.get_features(save_cache=False)
+
+    X_clean, y_clean = features.clean_features(raw)
+    X_clean, y_clean = pd.DataFrame(X_clean), pd.DataFrame(y_clean)
+
+    assert len(X) > 0
+    assert list(X.columns) == get_columns(PROFILE_COLUMNS if profiles else (), EQUITY_COLUMNS if equity else ())
+    assert sorted(X.columns) == sorted(X_clean.columns)
+
+    X_clean = X_clean[X.columns]
+    assert list(X.dtypes) == list(X_clean.dtypes)
+    assert np.array_equal(X.values, X_clean.values)
+    assert list(y.columns) == list(y_clean.columns)
+    for c in y.columns:
+        assert y[c].tolist() == y_clean[c].tolist()
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+from bot.util.equity import EquityCache
+
+
+KEYS = [1, 1 << 40, (1 << 64) - 1]
+
+
+def append_keys(path, offset, num):
+    cache = EquityCache(path)
+    cache.open_log()
+    for i in range(0, num, 4):
+        cache.update(dict((offset + i + j, 0.5) for j in range(4)))
+
+
+def compact_until(path, stop):
+    while not stop.is_set():
+        EquityCache(path).compact()
+
+
+def test_log_compact_reload(tmp_path):
+    path = str(tmp_path / 'cache')
+    cache = EquityCache(path)
+    cache.open_log()
+    cache.update({KEYS[0]: 0.25, KEYS[1]: 0.5})
+    cache.update({KEYS[2]: 0.75, KEYS[0]: 0.125})
+
+    logged = EquityCache(path)
+    assert logged.table is None
+    assert [logged.get(key) for key in KEYS] == [0.125, 0.5, 0.75]
+
+    assert logged.compact() == 3
+    assert os.path.getsize(path + '.log') == 0
+
+    compacted = EquityCache(path)
+    assert len(compacted.entries) == 0
+    assert [compacted.get(key) for key in KEYS] == [0.125, 0.5, 0.75]
+    assert compacted.get(2) is None
+
+
+def test_compact_keeps_table_and_memory_entries(tmp_path):
+    path = str(tmp_path / 'cache')
+    cache = EquityCache(path)
+    cache.update({KEYS[0]: 0.25})
+    assert not os.path.exists(path + '.log')
+    assert cache.compact() == 1
+
+    cache = EquityCache(path)
+    cache.update({KEYS[1]: 0.5})
+    assert cache.compact() == 2
+    assert [EquityCache(path).get(key) for key in KEYS[:2]] == [0.25, 0.5]
+
+
+def test_compact_while_appending(tmp_path):
+    path = str(tmp_path / 'cache')
+    stop = multiprocessing.Event()
+    compactor = multiprocessing.Process(target=compact_until, args=(path, stop))
+    compactor.start()
+
+    writers = [multiprocessing.Process(target=append_keys, args=(path, i * 10000, 1000)) for i in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    stop.set()
+    compactor.join()
+    EquityCache(path).compact()
+
+    cache = EquityCache(path)
+    assert all(cache.get(i * 10000 + k) == 0.5 for i in range(4) for k in range(1000))
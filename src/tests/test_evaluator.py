@@ -0,0 +1,57 @@
+import random
+import pytest
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.hand_evaluator import HandEvaluator
+from bot.util.equity import eval_hands
+from bot.util.evaluator import CARD_INDEX, encode_cards, eval_hand, gen_hand_rank_info
+
+
+CARDS = sorted(CARD_INDEX, key=CARD_INDEX.get)
+SPECIAL_HANDS = [
+    (['SA', 'S2'], ['S3', 'S4', 'S5', 'HK', 'DK']),
+    (['HA', 'D2'], ['C3', 'S4', 'H5', 'HK', 'DK']),
+    (['HT', 'HJ'], ['HQ', 'HK', 'HA', 'H9', 'H2']),
+    (['CQ', 'DQ'], ['HQ', 'SQ', 'H2', 'C2', 'D2']),
+    (['C7', 'D7'], ['H7', 'S9', 'H9', 'C9', 'D2']),
+    (['C7', 'D7'], ['H8', 'S8', 'H9', 'C9', 'D2']),
+    (['C2', 'D5'], ['H8', 'SJ', 'H9', 'CK', 'D3']),
+    (['H2', 'H5'], ['H8', 'HJ', 'H9', 'HK', 'D3']),
+    (['D9', 'S8'], ['C7', 'H6', 'S5', 'D4', 'C3'])
+]
+
+
+def get_deals(num, community_size, seed=1234):
+    rs = random.Random(seed + community_size)
+    deals = [rs.sample(CARDS, 2 + community_size) for _ in range(num)]
+    deals = [(deal[:2], deal[2:]) for deal in deals]
+    if community_size == 5:
+        deals += SPECIAL_HANDS
+
+    return deals
+
+
+def ppe_eval_hand(hole, community):
+    return HandEvaluator.eval_hand([Card.from_str(c) for c in hole], [Card.from_str(c) for c in community])
+
+
+@pytest.mark.parametrize('community_size', [0, 3, 4, 5])
+def test_eval_hand(community_size):
+    for hole, community in get_deals(3000, community_size):
+        assert eval_hand(encode_cards(hole), encode_cards(community)) == ppe_eval_hand(hole, community), \
+            (hole, community)
+
+
+@pytest.mark.parametrize('community_size', [0, 3, 5])
+def test_gen_hand_rank_info(community_size):
+    for hole, community in get_deals(500, community_size):
+        expected = HandEvaluator.gen_hand_rank_info([Card.from_str(c) for c in hole],
+                                                    [Card.from_str(c) for c in community])
+        assert gen_hand_rank_info(encode_cards(hole), encode_cards(community)) == expected, (hole, community)
+
+
+@pytest.mark.parametrize('community_size', [3, 4, 5])
+def test_eval_hands(community_size):
+    deals = get_deals(3000, community_size)
+    scores = eval_hands([encode_cards(hole) + encode_cards(community) for hole, community in deals]).tolist()
+
+    assert scores == [ppe_eval_hand(hole, community) for hole, community in deals]
@@ -0,0 +1,46 @@
+import numpy as np
+from bot.util import features
+from bot.util.state import COLUMNS, FeatureState
+
+
+EVENTS = ['on_game_start', 'on_round_start', 'on_street_start', 'on_player_action', 'on_declare_action',
+          'on_round_result']
+
+
+def test_feature_state_matches_game_player(games, monkeypatch):
+    states = {}
+    decider = [None]
+    vectors = []
+
+    def track(name):
+        handler = getattr(features, name)
+
+        def on_event(f, uuid, *args):
+            handler(f, uuid, *args)
+            if name == 'on_game_start':
+                states[uuid] = FeatureState()
+            getattr(states[uuid], name)(uuid, *args)
+            if name == 'on_declare_action':
+                decider[0] = uuid
+
+        return on_event
+
+    for name in EVENTS:
+        monkeypatch.setattr(features, name, track(name))
+
+    add_features = features.GamePlayer.add_features
+
+    def record(self, f):
+        vectors.append(states[decider[0]].get_vector().copy())
+        add_features(self, f)
+
+    monkeypatch.setattr(features.GamePlayer, 'add_features', record)
+
+    player = features.GamePlayer()
+    for game in games:
+        player.play_game(game)
+    X, _ = player.get_features(save_cache=False)
+
+    assert len(X) > 0
+    assert list(X.columns) == COLUMNS
+    assert np.array_equal(X.values.astype(np.float64), np.array(vectors))
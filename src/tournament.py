@@ -0,0 +1,101 @@
+import argparse
+import multiprocessing
+import random
+import time
+import numpy as np
+from pypokerengine.api.game import setup_config, start_poker
+from bot.baseline.bot import CallPlayer, EquityPlayer, RandomPlayer
+from bot.util.model import PokerSim
+from bot.v6final.bot import ManulPlayer6Final
+
+
+BOTS = {
+    'v6final': ManulPlayer6Final,
+    'call': CallPlayer,
+    'random': RandomPlayer,
+    'equity': EquityPlayer
+}
+
+
+def play_deal(args):
+    seed, lineup, max_round, initial_stack, small_blind = args
+    num_players = len(lineup)
+    result = []
+
+    for rotation in range(num_players):
+        random.seed(seed)
+        np.random.seed(seed % (2 ** 32))
+        sim = PokerSim(num_players, max_round)
+        sim.install()
+
+        seats = lineup[rotation:] + lineup[:rotation]
+        config = setup_config(max_round=max_round, initial_stack=initial_stack, small_blind_amount=small_blind)
+        for i, bot in enumerate(seats):
+            config.register_player(name='{}-{}'.format(bot, i), algorithm=BOTS[bot]())
+
+        players = start_poker(config, verbose=0)['players']
+        stacks = [p['stack'] for p in players]
+        winners = [i for i, stack in enumerate(stacks) if stack == max(stacks)]
+
+        for i, bot in enumerate(seats):
+            result.append((bot, stacks[i], 1 / len(winners) if i in winners else 0))
+
+    return seed, result
+
+
+def summarize(results):
+    bots = sorted(set(bot for _, result in results for bot, _, _ in result))
+    summary = {}
+
+    for bot in bots:
+        wins = []
+        stacks = []
+        for _, result in results:
+            wins.append(np.mean([win for b, _, win in result if b == bot]))
+            stacks.append(np.mean([stack for b, stack, _ in result if b == bot]))
+
+        wins = np.array(wins)
+        stacks = np.array(stacks)
+        n = len(wins)
+        summary[bot] = {
+            'deals': n,
+            'win_rate': wins.mean(),
+            'win_rate_ci': 1.96 * wins.std(ddof=1) / np.sqrt(n) if n > 1 else float('nan'),
+            'stack': stacks.mean(),
+            'stack_ci': 1.96 * stacks.std(ddof=1) / np.sqrt(n) if n > 1 else float('nan')
+        }
+
+    return summary
+
+
+def print_summary(summary):
+    print('{:10} {:>6} {:>17} {:>19}'.format('bot', 'deals', 'win rate', 'final stack'))
+    for bot, s in sorted(summary.items(), key=lambda x: -x[1]['win_rate']):
+        print('{:10} {:6d} {:8.3f} +- {:5.3f} {:9.1f} +- {:6.1f}'.format(
+            bot, s['deals'], s['win_rate'], s['win_rate_ci'], s['stack'], s['stack_ci']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deals', type=int, default=100)
+    parser.add_argument('--lineup', nargs='+', default=['v6final', 'v6final', 'call', 'call', 'random', 'random',
+                                                         'equity', 'equity'])
+    parser.add_argument('--max-round', type=int, default=50)
+    parser.add_argument('--initial-stack', type=int, default=1500)
+    parser.add_argument('--small-blind', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--num-workers', type=int, default=None)
+    args = parser.parse_args()
+
+    tasks = [(args.seed + i, args.lineup, args.max_round, args.initial_stack, args.small_blind)
+             for i in range(args.deals)]
+    results = []
+    start = time.time()
+
+    with multiprocessing.Pool(args.num_workers) as pool:
+        for i, result in enumerate(pool.imap_unordered(play_deal, tasks)):
+            results.append(result)
+            if (i + 1) % 10 == 0 or i + 1 == len(tasks):
+                print('Deals: {}/{}, elapsed: {:.0f} sec'.format(i + 1, len(tasks), time.time() - start))
+
+    print_summary(summarize(results))
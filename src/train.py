@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+import pandas as pd
+from catboost import CatBoostClassifier, CatBoostRegressor
+from bot.util.dataset import Dataset, load_Xy
+from bot.util.model import ModelPool
+
+
+KINDS = ['call', 'raise', 'raise_amount']
+CLASSIFIERS = {
+    'call': CatBoostClassifier,
+    'raise': CatBoostClassifier,
+    'raise_amount': CatBoostRegressor
+}
+
+X, y = None, None
+
+
+def set_data(X_data, y_data):
+    global X, y
+    X, y = X_data, y_data
+
+
+def get_target(kind, y):
+    if kind == 'call':
+        return y['private_bot_action'].replace({'FOLD': 0, 'CALL': 1, 'RAISE': 1})
+
+    if kind == 'raise':
+        y = y[y['private_bot_action'] != 'FOLD']
+        return y['private_bot_action'].replace({'CALL': 0, 'RAISE': 1})
+
+    y = y[y['private_bot_action'] == 'RAISE']
+    return y['private_bot_action_amount']
+
+
+def train_test_split(X, y, test_size=0.1, random_state=1234):
+    n_test = int(np.ceil(test_size * len(X)))
+    perm = np.random.RandomState(random_state).permutation(len(X))
+    train, test = perm[n_test:], perm[:n_test]
+
+    return X.iloc[train], X.iloc[test], y.iloc[train], y.iloc[test]
+
+
+def get_folds(n, folds, random_state=1234):
+    return np.array_split(np.random.RandomState(random_state).permutation(n), folds)
+
+
+def get_hash(*values):
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def get_models_hash(model_dir, kind, num):
+    h = hashlib.sha1()
+    for i in range(num):
+        with open(model_dir + 'pool/' + kind + '/' + str(i) + '.model', 'rb') as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+def fit(kind, X_game, y_game, params):
+    X_train, X_test, y_train, y_test = train_test_split(X_game, y_game)
+
+    if kind == 'raise' and len(y_game.value_counts()) == 1:
+        y_train, y_test = y_train.copy(), y_test.copy()
+        y_train.iloc[0] = 0
+        y_train.iloc[1] = 1
+        y_test.iloc[0] = 0
+        y_test.iloc[1] = 1
+
+    model = CLASSIFIERS[kind](verbose=False, use_best_model=True, allow_writing_files=False, **params)
+    model.fit(X_train, y_train, eval_set=(X_test, y_test))
+
+    return model
+
+
+def train_pool_model(kind, i, name, model_dir, params):
+    y_game = get_target(kind, y[y['private_bot_name'] == name])
+    model = fit(kind, X.loc[y_game.index], y_game, params)
+    model.save_model(model_dir + 'pool/' + kind + '/' + str(i) + '.model')
+
+    return 'pool/' + kind + '/' + str(i) + ' (' + name + ')', len(y_game), model.get_best_iteration(), None
+
+
+def train_fold_model(kind, i, name, fold, folds, params):
+    y_game = get_target(kind, y[y['private_bot_name'] == name])
+    X_game = X.loc[y_game.index]
+    test = get_folds(len(y_game), folds)[fold]
+    train = np.setdiff1d(np.arange(len(y_game)), test)
+
+    model = fit(kind, X_game.iloc[train], y_game.iloc[train], params)
+    oof = (y_game.index[test].values, model.predict(X_game.iloc[test]))
+
+    return 'oof/' + kind + '/' + str(i) + ' fold ' + str(fold) + ' (' + name + ')', len(train), \
+        model.get_best_iteration(), oof
+
+
+def run_task(task):
+    start = time.time()
+    result = task[1](*task[2:])
+
+    return (task[0],) + result + (time.time() - start,)
+
+
+def get_pool_predictions(kind, names, model_dir, cache_path, index):
+    path = cache_path + kind + '-pool-' + get_hash(kind, names, get_models_hash(model_dir, kind, len(names))) + '.npy'
+    if os.path.isfile(path):
+        return np.load(path)
+
+    X_kind = X.loc[index]
+    models = ModelPool(len(names), model_dir + 'pool/' + kind + '/', classifier=CLASSIFIERS[kind]).models
+    X_pool = np.column_stack([m.predict(X_kind) for m in models]).astype(np.float64)
+    np.save(path, X_pool)
+
+    return X_pool
+
+
+def train_meta_model(kind, names, model_dir, cache_path, oof, params):
+    y_game = get_target(kind, y)
+    X_pool = get_pool_predictions(kind, names, model_dir, cache_path, y_game.index)
+
+    if oof is not None:
+        X_pool = X_pool.copy()
+        bots = pd.Categorical(y.loc[y_game.index, 'private_bot_name'], categories=names).codes
+        X_pool[np.arange(len(X_pool)), bots] = oof
+
+    X_pool = pd.DataFrame(X_pool, index=y_game.index, columns=['model_' + str(i) for i in range(len(names))])
+    model = fit(kind, X_pool, y_game, params)
+    model.save_model(model_dir + kind + '.model')
+
+    return kind, len(y_game), model.get_best_iteration(), None
+
+
+def train(X_data, y_data, names, model_dir, cache_dir, num_workers, params, meta_params, kinds=KINDS, folds=5,
+          meta_only=False):
+    set_data(X_data, y_data)
+    os.makedirs(cache_dir, exist_ok=True)
+    for kind in kinds:
+        os.makedirs(model_dir + 'pool/' + kind, exist_ok=True)
+
+    tasks = []
+    oof = {}
+    oof_paths = {}
+    for kind in kinds:
+        if not meta_only:
+            tasks += [(kind, train_pool_model, kind, i, name, model_dir, params) for i, name in enumerate(names)]
+
+        oof[kind] = None
+        if folds > 1:
+            oof_paths[kind] = cache_dir + kind + '-oof-' + get_hash(kind, names, folds, params) + '.npy'
+            if os.path.isfile(oof_paths[kind]):
+                oof[kind] = np.load(oof_paths[kind])
+            else:
+                oof[kind] = pd.Series(np.nan, index=get_target(kind, y).index)
+                tasks += [(kind, train_fold_model, kind, i, name, fold, folds, params)
+                          for i, name in enumerate(names) for fold in range(folds)]
+
+    remaining = dict((kind, sum(1 for t in tasks if t[0] == kind)) for kind in kinds)
+    meta = []
+    start = time.time()
+
+    def report(result):
+        kind, model, rows, best, _, elapsed = result
+        print('{:40} rows: {:7d}, best iteration: {:4d}, {:6.1f} sec, total: {:.0f} sec'.format(
+            model, rows, best, elapsed, time.time() - start))
+
+    def train_meta(kind):
+        if isinstance(oof[kind], pd.Series):
+            oof[kind] = oof[kind].values
+            np.save(oof_paths[kind], oof[kind])
+
+        task = (kind, train_meta_model, kind, names, model_dir, cache_dir, oof[kind], meta_params)
+        meta.append(pool.apply_async(run_task, (task,)))
+
+    with multiprocessing.Pool(num_workers, initializer=set_data, initargs=(X_data, y_data)) as pool:
+        for kind in kinds:
+            if remaining[kind] == 0:
+                train_meta(kind)
+
+        for result in pool.imap_unordered(run_task, tasks):
+            report(result)
+            kind = result[0]
+            if result[4] is not None:
+                index, predicts = result[4]
+                oof[kind].loc[index] = predicts
+
+            remaining[kind] -= 1
+            if remaining[kind] == 0:
+                train_meta(kind)
+
+        for result in meta:
+            report(result.get())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_dir', help='extracted features dir (with X/ and y/)')
+    parser.add_argument('--model-dir', default='model/final/')
+    parser.add_argument('--player-names', nargs='+', default=None)
+    parser.add_argument('--kinds', nargs='+', default=KINDS, choices=KINDS)
+    parser.add_argument('--folds', type=int, default=5, help='out-of-fold pool predictions, 0 to disable')
+    parser.add_argument('--meta-only', action='store_true', help='reuse existing pool models')
+    parser.add_argument('--thread-count', type=int, default=4, help='CPU threads per model')
+    parser.add_argument('--num-workers', type=int, default=None, help='models trained at once')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--learning-rate', type=float, default=0.1)
+    parser.add_argument('--depth', type=int, default=8)
+    parser.add_argument('--meta-iterations', type=int, default=200)
+    parser.add_argument('--meta-depth', type=int, default=2)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir.rstrip('/') + '/'
+    X, y = load_Xy(data_dir)
+    if args.player_names is not None:
+        y = y[y['private_bot_name'].isin(args.player_names)]
+        X = X.loc[y.index]
+
+    names = sorted(y['private_bot_name'].unique().tolist())
+    print('Models: ' + ', '.join('{}={}'.format(i, name) for i, name in enumerate(names)))
+
+    num_workers = args.num_workers
+    if num_workers is None:
+        num_workers = max(1, multiprocessing.cpu_count() // args.thread_count)
+
+    params = {
+        'iterations': args.iterations,
+        'learning_rate': args.learning_rate,
+        'depth': args.depth,
+        'thread_count': args.thread_count
+    }
+    meta_params = dict(params, iterations=args.meta_iterations, depth=args.meta_depth)
+    dataset_hash = get_hash(Dataset(data_dir + 'X').fingerprint(), Dataset(data_dir + 'y').fingerprint(), len(y))
+    cache_dir = data_dir + 'oof/' + dataset_hash + '/'
+    train(X, y, names, args.model_dir.rstrip('/') + '/', cache_dir, num_workers, params, meta_params, args.kinds,
+          args.folds, args.meta_only)